@@ -0,0 +1,27 @@
+# Blender is only needed by the importer: the geometry structures, file parsers and
+# decoded assets below can be used from a plain Python interpreter.
+
+from .geometry import VertexComponent, VertexDeclaration, VertexElementType, VERTEX_ELEMENT_DTYPES, Vertex, VertexColumns, Bone, BoneColumns, Blob, ModelElement, GeometryFragment, Material, BlendEffect
+from .parsers import XdbParser, BinParser, BoneBinParser, IndexBinConverter, VertexBinConverter
+from .writers import BinWriter, BoneBinWriter, XdbWriter, vertex_declaration_for
+from .asset import DECODER_VERSION, GeometryAsset, AssetLoader, model_name, load_asset, lod_ranges, dequantize_normals, dequantize_colors, dequantize_texcoords, asset_to_arrays, asset_from_arrays, save_npz, save_asset
+from .cache import GeometryCache, default_cache_directory
+from .catalog import AssetCatalog, CatalogEntry, default_catalog_path
+from .profiling import Profiler
+
+## Addon registration
+
+bl_info = {
+    'name': 'Allods Online geometry',
+    'category': 'Import-Export',
+    'version': (0, 0, 2),
+    'blender': (2, 90, 0)
+}
+
+def register():
+    from . import importer
+    importer.register()
+
+def unregister():
+    from . import importer
+    importer.unregister()
@@ -0,0 +1,13 @@
+import argparse
+import sys
+
+from . import catalog, convert
+
+# One subcommand per tool, so that no source directory name is mistaken for another tool
+arguments = argparse.ArgumentParser(prog='python -m allods_geometry', description='Allods Online geometry tools')
+tools = arguments.add_subparsers(dest='tool', required=True)
+convert.add_arguments(tools.add_parser('convert', help=convert.DESCRIPTION, description=convert.DESCRIPTION))
+catalog.add_arguments(tools.add_parser('catalog', help=catalog.DESCRIPTION, description=catalog.DESCRIPTION))
+args = arguments.parse_args()
+
+sys.exit(convert.run(args) if args.tool == 'convert' else catalog.run(args))
@@ -0,0 +1,388 @@
+import numpy as np
+
+import hashlib
+import pathlib
+import re
+import threading
+
+from concurrent.futures import Future
+
+from .geometry import VertexColumns, BoneColumns, ModelElement, GeometryFragment, Material, BlendEffect
+from .parsers import XdbParser, BinParser, BoneBinParser, IndexBinConverter, VertexBinConverter
+from .profiling import Profiler
+from .writers import BinWriter, BoneBinWriter, XdbWriter, vertex_declaration_for
+
+# Bump when decoding changes the content of a GeometryAsset, invalidates cached assets
+DECODER_VERSION = 5
+
+# Vertex bone indices address 4x3 matrix registers, three per bone, 255 marks an unused influence
+BONE_INDEX_STRIDE = 3
+UNUSED_BONE_INDEX = 255
+
+## Vertex attributes
+
+def _unpack(column, signed):
+    # Float components as they are, integer ones mapped to [-1, 1] when signed or [0, 1], like normalized D3D types
+    if column.dtype.kind == 'f':
+        return column.astype(np.float32)
+    scale = np.float32(np.iinfo(column.dtype).max)
+    values = column.astype(np.float32) / scale
+    if signed and column.dtype.kind == 'u':
+        values = values * 2 - 1
+    return np.clip(values, -1 if signed else 0, 1, out=values)
+
+def dequantize_normals(column):
+    """(n, 3) float32 unit normals from a normal column of any vertex element type. Byte components (COLOR4) are
+    stored in x, y, z, w order, zero normals are left as they are"""
+    normals = _unpack(np.asarray(column).reshape(len(column), -1)[:, :3], signed=True)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+    return normals
+
+def dequantize_colors(column):
+    """(n, 4) float32 linear RGBA colors from an sRGB color column of any vertex element type, alpha 1 when missing"""
+    values = _unpack(np.asarray(column).reshape(len(column), -1)[:, :4], signed=False)
+    colors = np.ones((len(values), 4), dtype=np.float32)
+    colors[:, :values.shape[1]] = values
+    rgb = colors[:, :3]
+    colors[:, :3] = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    return colors
+
+def dequantize_texcoords(column):
+    """(n, 2) float32 UVs from a texcoord column, integer types are not normalized like their D3D declaration types"""
+    return np.asarray(column).reshape(len(column), -1)[:, :2].astype(np.float32)
+
+## Decoded assets
+
+class GeometryAsset:
+
+    def __init__(self, name, vertices, indices, model_elements, skeleton):
+        self.name = name
+        self.vertices = vertices
+        self.indices = indices
+        self.model_elements = model_elements
+        self.skeleton = skeleton
+
+    def get_vertex_range(self, model_element, lod):
+        vertex_range = slice(model_element.vertex_buffer_offset + lod.vertex_buffer_begin, model_element.vertex_buffer_offset + lod.vertex_buffer_end)
+        if vertex_range.start < 0 or vertex_range.stop > self.vertices.count or vertex_range.start > vertex_range.stop:
+            raise Exception(f"Model element {model_element.name}: vertices {vertex_range.start}..{vertex_range.stop} out of the {self.vertices.count} vertices of the vertex buffer")
+        return vertex_range
+
+    def get_triangles(self, model_element, lod_level):
+        # (n, 3) vertex indices of a LOD, relative to the start of its vertex range
+        lod = model_element.lods[lod_level]
+        if lod.index_buffer_end > len(self.indices) or (lod.index_buffer_end - lod.index_buffer_begin) % 3 != 0:
+            raise Exception(f"Model element {model_element.name} LOD {lod_level}: indices {lod.index_buffer_begin}..{lod.index_buffer_end} are not whole triangles of the {len(self.indices)} indices of the index buffer")
+        triangles = np.subtract(self.indices[lod.index_buffer_begin:lod.index_buffer_end], lod.vertex_buffer_begin, dtype=np.int32)
+        vertex_count = lod.vertex_buffer_end - lod.vertex_buffer_begin
+        if len(triangles) > 0:
+            lowest, highest = triangles.min(), triangles.max()
+            if lowest < 0 or highest >= vertex_count:
+                raise Exception(f"Model element {model_element.name} LOD {lod_level}: vertex indices {lowest}..{highest} out of its {vertex_count} vertices")
+        return triangles.reshape(-1, 3)
+
+    def is_skinned(self):
+        return self.vertices.weights is not None and self.vertices.indices is not None and self.skeleton.count > 0
+
+    def get_bind_matrices(self):
+        # (n, 4, 4) world matrices of the bones in bind pose, in column-vector convention (translation in the last column).
+        # Skinned bones have an inverted world matrix, the others are placed by composing local matrices from the root.
+        skeleton = self.skeleton
+        parents = skeleton.parents.astype(np.int64)
+        parents[parents >= skeleton.count] = -1
+
+        # Depth of every bone, found level by level following parents up to the root
+        depths = np.zeros(skeleton.count, dtype=np.int64)
+        ancestors = parents.copy()
+        while np.any(ancestors >= 0):
+            has_ancestor = ancestors >= 0
+            depths[has_ancestor] += 1
+            ancestors[has_ancestor] = parents[ancestors[has_ancestor]]
+            if depths.max() > skeleton.count:
+                raise Exception(f"Skeleton of {self.name} has a parent cycle")
+
+        # Skinned bones use the inverse of their inverted world matrix, the one their vertices are bound with
+        inverted_world_matrices = skeleton.inverted_world_matrices.astype(np.float64)
+        skinned = ~np.all(np.isclose(inverted_world_matrices, np.identity(4)), axis=(1, 2))
+        skinned_world_matrices = np.zeros_like(inverted_world_matrices)
+        if np.any(skinned):
+            skinned_world_matrices[skinned] = np.linalg.inv(inverted_world_matrices[skinned])
+
+        # Row-vector convention: world = local @ parent world, each level in one batched product from the final
+        # world matrices of the level above, so that other bones follow the bind pose of their skinned parents
+        local_matrices = skeleton.local_matrices.astype(np.float64)
+        world_matrices = local_matrices.copy()
+        for depth in range(depths.max(initial=0) + 1):
+            level = np.flatnonzero(depths == depth)
+            if depth > 0:
+                world_matrices[level] = local_matrices[level] @ world_matrices[parents[level]]
+            level = level[skinned[level]]
+            world_matrices[level] = skinned_world_matrices[level]
+
+        return world_matrices.transpose(0, 2, 1)
+
+    def get_skin_weights(self, model_element, lod_level):
+        # Normalized influences of the vertices of a LOD, grouped by (bone, weight): list of (bone, weight, vertex indices)
+        vertex_range = self.get_vertex_range(model_element, model_element.lods[lod_level])
+        indices = self.vertices.indices[vertex_range].astype(np.int64)
+        weights = self.vertices.weights[vertex_range].astype(np.float64)
+
+        bones = indices // BONE_INDEX_STRIDE
+        valid = (indices != UNUSED_BONE_INDEX) & (bones < self.skeleton.count) & (weights > 0)
+        weights[~valid] = 0
+        totals = weights.sum(axis=1, keepdims=True)
+        np.divide(weights, totals, out=weights, where=totals > 0)
+
+        vertices = np.broadcast_to(np.arange(len(indices))[:, np.newaxis], indices.shape)[valid]
+        bones = bones[valid]
+        weights = weights[valid]
+        if len(bones) == 0:
+            return []
+
+        # Influences of a vertex on the same bone add up
+        keys = vertices * self.skeleton.count + bones
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        weights = np.add.reduceat(weights[order], starts)
+        vertices, bones = np.divmod(keys[starts], self.skeleton.count)
+        weights = weights.astype(np.float32)
+
+        # One batch per (bone, weight), vertex indices in increasing order inside a batch
+        order = np.lexsort((vertices, weights, bones))
+        vertices, bones, weights = vertices[order], bones[order], weights[order]
+        boundaries = np.flatnonzero((np.diff(bones) != 0) | (np.diff(weights) != 0)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(bones)]))
+        return [(int(bones[start]), float(weights[start]), vertices[start:end]) for start, end in zip(starts.tolist(), ends.tolist())]
+
+    def get_fingerprint(self, model_element, lod_level):
+        # Hash of the vertices and triangles of a LOD, byte-identical geometry has the same fingerprint
+        vertex_range = self.get_vertex_range(model_element, model_element.lods[lod_level])
+        digest = hashlib.blake2b(digest_size=16)
+        for name in VertexBinConverter.COMPONENTS:
+            column = getattr(self.vertices, name)
+            if column is not None:
+                digest.update(f"{name}:{column.dtype.str}{column.shape[1:]}".encode('utf-8'))
+                digest.update(np.ascontiguousarray(column[vertex_range]).data)
+        digest.update(self.get_triangles(model_element, lod_level).data)
+        return digest.hexdigest()
+
+def model_name(path):
+    return re.sub(r'(\.\(.*\))?\.xdb', '', pathlib.Path(path).name)
+
+class AssetLoader:
+
+    # Handle on an asset being loaded. The .bin archive is inflated blob by blob on a background thread from
+    # the start, while result() parses the .xdb file on the calling thread and then decodes each blob as soon
+    # as it is inflated. zlib releases the GIL, so inflating overlaps with parsing and decoding. Archives
+    # smaller than MIN_PIPELINED_SIZE inflate faster than a thread starts, they are inflated by result()
+    MIN_PIPELINED_SIZE = 1 << 16
+
+    def __init__(self, path, profiler=None):
+        self.path = pathlib.Path(path)
+        self.profiler = profiler if profiler != None else Profiler()
+        self._asset = None
+        self._blobs = dict() # localId -> Future of the inflated buffer
+        self._inflated = False
+        self._error = None
+        self._lock = threading.Lock()
+        self._inflate_profiler = self.profiler.fork()
+        self._thread = None
+        bin_path = self.path.with_suffix('.bin')
+        if not bin_path.is_file() or bin_path.stat().st_size >= AssetLoader.MIN_PIPELINED_SIZE:
+            self._thread = threading.Thread(target=self._inflate, name=f"inflate {self.path.name}", daemon=True)
+            self._thread.start()
+
+    def _inflate(self):
+        error = None
+        try:
+            with BinParser(self.path.with_suffix('.bin'), lazy=True) as bin_parser:
+                blobs = bin_parser.iter_blobs()
+                while True:
+                    with self._inflate_profiler.span('inflate'):
+                        blob = next(blobs, None)
+                    if blob == None:
+                        break
+                    self.blob(blob[0]).set_result(blob[1])
+            self._inflate_profiler.count('bytes_inflated', sum(8 + size for _, _, size in bin_parser.offsets))
+        except Exception as e:
+            error = e
+        # Blobs waited for but not in the archive
+        with self._lock:
+            self._inflated = True
+            self._error = error
+            pending = [(localId, future) for localId, future in self._blobs.items() if not future.done()]
+        for localId, future in pending:
+            future.set_exception(self._missing_blob(localId))
+
+    def _missing_blob(self, localId):
+        return self._error if self._error != None else Exception('Missing blob {} in archive {}'.format(localId, self.path.with_suffix('.bin')))
+
+    def blob(self, localId):
+        """Future of the inflated buffer of blob localId"""
+        with self._lock:
+            future = self._blobs.get(localId)
+            if future == None:
+                future = self._blobs[localId] = Future()
+                if self._inflated:
+                    future.set_exception(self._missing_blob(localId))
+            return future
+
+    def _wait(self, blob):
+        with self.profiler.span('inflate_wait'):
+            buffer = self.blob(blob.localId).result()
+        if len(buffer) != blob.size:
+            raise Exception('Blob {} of archive {} has {} bytes, expected {}'.format(blob.localId, self.path.with_suffix('.bin'), len(buffer), blob.size))
+        return buffer
+
+    def result(self):
+        """Wait for the blobs of the asset and return it decoded"""
+        if self._asset != None:
+            return self._asset
+        profiler = self.profiler
+        if self._thread == None:
+            self._inflate()
+
+        with profiler.span('xdb_parse'):
+            parser = XdbParser(self.path)
+
+        # vertex_declaration_id is always 0, otherwise need per element converter
+        vertex_bin_converter = VertexBinConverter(parser.get_vertex_declarations()[0])
+
+        # Parse vertices (points)
+        vertex_buffer = self._wait(parser.get_vertex_buffer())
+        with profiler.span('vertex_decode'):
+            vertices = vertex_bin_converter.bin_to_columns(vertex_buffer)
+
+        # Parse indices (faces)
+        index_buffer = self._wait(parser.get_index_buffer())
+        with profiler.span('index_decode'):
+            indices = IndexBinConverter(parser.get_index_count(), parser.get_vb32()).bin_to_indices(index_buffer)
+
+        # Parse skeleton
+        skeleton_buffer = self._wait(parser.get_skeleton())
+        with profiler.span('skeleton_decode'):
+            skeleton_parser = BoneBinParser(skeleton_buffer)
+            skeleton = skeleton_parser.get_bone_columns()
+
+        if self._thread != None:
+            self._thread.join()
+        profiler.merge(self._inflate_profiler)
+
+        self._asset = GeometryAsset(model_name(self.path), vertices, indices, parser.get_model_elements(), skeleton)
+        return self._asset
+
+def load_asset(path, profiler=None):
+    return AssetLoader(path, profiler).result()
+
+def lod_ranges(asset):
+    # One row per LOD fragment: element, lod level, element vertex offset, vertex range, index range
+    return np.array([
+        (element_index, lod_level, model_element.vertex_buffer_offset, lod.vertex_buffer_begin, lod.vertex_buffer_end, lod.index_buffer_begin, lod.index_buffer_end)
+        for element_index, model_element in enumerate(asset.model_elements)
+        for lod_level, lod in enumerate(model_element.lods)
+    ], dtype=np.int64).reshape(-1, 7)
+
+def asset_to_arrays(asset):
+    arrays = dict()
+
+    for name in VertexBinConverter.COMPONENTS:
+        column = getattr(asset.vertices, name)
+        if column is not None:
+            arrays[name] = np.ascontiguousarray(column)
+
+    arrays['index_buffer'] = np.ascontiguousarray(asset.indices)
+
+    arrays['element_names'] = np.array([model_element.name for model_element in asset.model_elements], dtype=str)
+    arrays['element_material_names'] = np.array([model_element.material_name for model_element in asset.model_elements], dtype=str)
+    arrays['element_vertex_buffer_offsets'] = np.array([model_element.vertex_buffer_offset for model_element in asset.model_elements], dtype=np.int64)
+    arrays['element_vertex_declaration_ids'] = np.array([model_element.vertex_declaration_id for model_element in asset.model_elements], dtype=np.int64)
+    arrays['element_skin_indices'] = np.array([model_element.skin_index for model_element in asset.model_elements], dtype=np.int64)
+    arrays['element_virtual_offsets'] = np.array([model_element.virtual_offset for model_element in asset.model_elements], dtype=np.float64)
+
+    arrays['lod_ranges'] = lod_ranges(asset)
+
+    # Elements without a material have an empty row, blend effect -1 when unknown
+    materials = [model_element.material for model_element in asset.model_elements]
+    arrays['material_present'] = np.array([material != None for material in materials], dtype=bool)
+    arrays['material_blend_effects'] = np.array([material.blend_effect.value if material != None and material.blend_effect != None else -1 for material in materials], dtype=np.int64)
+    arrays['material_diffuse_textures'] = np.array([material.diffuse_texture or "" if material != None else "" for material in materials], dtype=str)
+    arrays['material_transparency_textures'] = np.array([material.transparency_texture or "" if material != None else "" for material in materials], dtype=str)
+    arrays['material_flags'] = np.array([(material.scroll_alpha, material.scroll_rgb, material.transparent, material.use_fog, material.visible) if material != None else (False,) * 5
+                                         for material in materials], dtype=bool).reshape(-1, 5)
+    arrays['material_translate_speeds'] = np.array([(material.u_translate_speed, material.v_translate_speed) if material != None else (0.0, 0.0)
+                                                    for material in materials], dtype=np.float64).reshape(-1, 2)
+
+    arrays['bone_names'] = np.array(asset.skeleton.names, dtype=str)
+    arrays['bone_ids'] = np.ascontiguousarray(asset.skeleton.ids, dtype=np.uint16)
+    arrays['bone_parents'] = np.ascontiguousarray(asset.skeleton.parents, dtype=np.uint32)
+    arrays['bone_inverted_world_matrices'] = np.ascontiguousarray(asset.skeleton.inverted_world_matrices, dtype=np.float32).reshape(-1, 4, 4)
+    arrays['bone_local_matrices'] = np.ascontiguousarray(asset.skeleton.local_matrices, dtype=np.float32).reshape(-1, 4, 4)
+
+    return arrays
+
+def asset_from_arrays(name, arrays):
+    columns = [arrays[component] if component in arrays else None for component in VertexBinConverter.COMPONENTS]
+    vertices = VertexColumns(len(arrays['position']), *columns)
+
+    lods = [[] for _ in arrays['element_names']]
+    for element_index, _, _, vertex_buffer_begin, vertex_buffer_end, index_buffer_begin, index_buffer_end in arrays['lod_ranges'].tolist():
+        lods[element_index].append(GeometryFragment(vertex_buffer_begin, vertex_buffer_end, index_buffer_begin, index_buffer_end))
+
+    materials = []
+    for present, blend_effect, diffuse_texture, transparency_texture, flags, speeds in zip(arrays['material_present'].tolist(), arrays['material_blend_effects'].tolist(),
+            arrays['material_diffuse_textures'].tolist(), arrays['material_transparency_textures'].tolist(), arrays['material_flags'].tolist(), arrays['material_translate_speeds'].tolist()):
+        if not present:
+            materials.append(None)
+            continue
+        scroll_alpha, scroll_rgb, transparent, use_fog, visible = flags
+        materials.append(Material(BlendEffect(blend_effect) if blend_effect >= 0 else None, diffuse_texture, scroll_alpha, scroll_rgb, transparency_texture,
+                                  transparent, use_fog, speeds[0], visible, speeds[1]))
+
+    model_elements = []
+    for element_index, element_name in enumerate(arrays['element_names'].tolist()):
+        model_elements.append(ModelElement(
+            lods[element_index],
+            element_name,
+            str(arrays['element_material_names'][element_index]),
+            int(arrays['element_vertex_declaration_ids'][element_index]),
+            int(arrays['element_vertex_buffer_offsets'][element_index]),
+            materials[element_index],
+            int(arrays['element_skin_indices'][element_index]),
+            float(arrays['element_virtual_offsets'][element_index])
+        ))
+
+    skeleton = BoneColumns(len(arrays['bone_names']), arrays['bone_names'].tolist(), arrays['bone_parents'], arrays['bone_ids'],
+                           arrays['bone_inverted_world_matrices'], arrays['bone_local_matrices'])
+
+    return GeometryAsset(name, vertices, arrays['index_buffer'], model_elements, skeleton)
+
+def save_npz(asset, path):
+    np.savez(path, **asset_to_arrays(asset))
+
+def save_asset(asset, path, vertex_declaration=None, template=None):
+    """Write asset as an .xdb file at path and its .bin archive, with vertices packed with vertex_declaration
+    (by default their components one after the other) and the other elements of the template .xdb if any"""
+    path = pathlib.Path(path)
+    vertex_declaration = vertex_declaration if vertex_declaration != None else vertex_declaration_for(asset.vertices)
+
+    bin_writer = BinWriter(path.with_suffix('.bin'))
+    try:
+        vertex_blob = bin_writer.add_blob(VertexBinConverter(vertex_declaration).columns_to_bin(asset.vertices))
+        index_blob = bin_writer.add_blob(IndexBinConverter.indices_to_bin(asset.indices))
+        skeleton_blob = bin_writer.add_blob(BoneBinWriter(asset.skeleton).to_bin())
+    finally:
+        bin_writer.close()
+
+    xdb_writer = XdbWriter(template)
+    xdb_writer.set_vertex_declarations([vertex_declaration])
+    xdb_writer.set_blob('vertexBuffer', vertex_blob)
+    xdb_writer.set_blob('indexBuffer', index_blob)
+    xdb_writer.set_blob('skeleton', skeleton_blob)
+    xdb_writer.set_model_elements(asset.model_elements)
+    xdb_writer.set_vb32(IndexBinConverter.is_vb32(asset.indices))
+    if xdb_writer.get_binary_file() == None:
+        xdb_writer.set_binary_file(path.with_suffix('.bin').name)
+    xdb_writer.write(path)
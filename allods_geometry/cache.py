@@ -0,0 +1,124 @@
+import numpy as np
+
+import hashlib
+import os
+import pathlib
+import shutil
+import threading
+
+from .asset import DECODER_VERSION, model_name, load_asset, asset_to_arrays, asset_from_arrays
+from .profiling import Profiler
+
+## Decoded geometry cache
+
+def default_cache_directory():
+    return pathlib.Path.home() / '.cache' / 'allods_geometry'
+
+class GeometryCache:
+
+    HASH_CHUNK_SIZE = 1 << 20
+
+    # Entries are directories of .npy files named after the hash of the .xdb and .bin contents,
+    # their modification time is refreshed on every hit and the oldest ones are evicted first.
+    # Assets are decoded and stored from worker threads, the lock serializes stores, evictions and counters
+    def __init__(self, directory=None, max_size=1 << 30):
+        self.directory = pathlib.Path(directory) if directory else default_cache_directory()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, path):
+        path = pathlib.Path(path)
+        digest = hashlib.sha256(f"allods_geometry:{DECODER_VERSION}".encode('utf-8'))
+        for file_path in (path, path.with_suffix('.bin')):
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(GeometryCache.HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def load_asset(self, path, profiler=None):
+        profiler = profiler if profiler != None else Profiler()
+        with profiler.span('cache_lookup'):
+            key = self.key(path)
+            asset = self.get(key, model_name(path))
+        if asset == None:
+            asset = load_asset(path, profiler)
+            with profiler.span('cache_store'):
+                self.put(key, asset)
+        return asset
+
+    def get(self, key, name):
+        entry = self.directory / key
+        if not entry.is_dir():
+            self._count(hit=False)
+            return None
+        try:
+            arrays = {array_path.stem: np.load(array_path, mmap_mode='r') for array_path in entry.glob('*.npy')}
+            asset = asset_from_arrays(name, arrays)
+            os.utime(entry)
+        except (OSError, ValueError, KeyError):
+            # Partially evicted or damaged entry, decode again
+            shutil.rmtree(entry, ignore_errors=True)
+            self._count(hit=False)
+            return None
+        self._count(hit=True)
+        return asset
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key, asset):
+        entry = self.directory / key
+        with self._lock:
+            if entry.is_dir():
+                return
+            # Written aside and renamed so concurrent readers never see a partial entry
+            staging = self.directory / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+            staging.mkdir(parents=True, exist_ok=True)
+            for array_name, array in asset_to_arrays(asset).items():
+                np.save(staging / f"{array_name}.npy", array)
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+            self._evict()
+
+    def entries(self):
+        # (modification time, size, path) of each entry, least recently used first
+        entries = []
+        if self.directory.is_dir():
+            for entry in self.directory.iterdir():
+                if entry.is_dir() and entry.suffix != '.tmp':
+                    try:
+                        size = sum(f.stat().st_size for f in entry.iterdir())
+                        entries.append((entry.stat().st_mtime, size, entry))
+                    except OSError:
+                        # Evicted or replaced by another process meanwhile
+                        continue
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        entries = self.entries()
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+
+    def clear(self):
+        with self._lock:
+            for _, _, entry in self.entries():
+                shutil.rmtree(entry, ignore_errors=True)
@@ -0,0 +1,319 @@
+import argparse
+import hashlib
+import os
+import pathlib
+import sqlite3
+import sys
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .asset import model_name
+from .convert import find_assets
+from .geometry import VertexElementType
+from .parsers import XdbParser, BinParser, BoneBinParser, VertexBinConverter
+
+## Asset catalog
+
+# Bump when the schema or the extracted metadata change, the catalog is rebuilt
+CATALOG_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE assets (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    xdb_mtime INTEGER NOT NULL,
+    xdb_size INTEGER NOT NULL,
+    bin_mtime INTEGER NOT NULL,
+    bin_size INTEGER NOT NULL,
+    binary_file TEXT,
+    vertex_declaration TEXT,
+    stride INTEGER,
+    vertex_size INTEGER,
+    index_size INTEGER,
+    skeleton_size INTEGER,
+    vertices INTEGER,
+    triangles INTEGER,
+    skinned INTEGER,
+    skeletons_scanned INTEGER NOT NULL,
+    skeleton TEXT,
+    error TEXT
+);
+CREATE TABLE elements (
+    asset INTEGER NOT NULL,
+    element INTEGER NOT NULL,
+    name TEXT,
+    material_name TEXT,
+    diffuse_texture TEXT,
+    transparency_texture TEXT,
+    skin_index INTEGER
+);
+CREATE TABLE lods (
+    asset INTEGER NOT NULL,
+    element INTEGER NOT NULL,
+    lod INTEGER NOT NULL,
+    vertex_begin INTEGER,
+    vertex_end INTEGER,
+    index_begin INTEGER,
+    index_end INTEGER,
+    triangles INTEGER
+);
+CREATE TABLE bones (
+    asset INTEGER NOT NULL,
+    bone INTEGER NOT NULL,
+    name TEXT
+);
+CREATE INDEX elements_asset ON elements (asset);
+CREATE INDEX lods_asset ON lods (asset);
+CREATE INDEX bones_asset ON bones (asset);
+CREATE INDEX bones_name ON bones (name);
+CREATE INDEX assets_triangles ON assets (triangles);
+CREATE INDEX assets_skeleton ON assets (skeleton);
+"""
+
+def default_catalog_path():
+    return pathlib.Path.home() / '.cache' / 'allods_geometry_catalog.sqlite'
+
+def vertex_declaration_signature(vertex_declaration):
+    # Used components as name:TYPE@offset, in declaration order
+    return ' '.join(f"{name}:{getattr(vertex_declaration, name).type.name}@{getattr(vertex_declaration, name).offset}"
+                    for name in VertexBinConverter.COMPONENTS if getattr(vertex_declaration, name).type != VertexElementType.UNUSED)
+
+def read_metadata(path, skeletons=False):
+    """Catalog rows of the asset at path from its .xdb file. With skeletons, the skeleton blob of the .bin
+    archive is also inflated for its digest and bone names"""
+    parser = XdbParser(path)
+    vertex_declaration = parser.get_vertex_declarations()[0] # vertex_declaration_id is always 0
+    vertex_buffer, index_buffer, skeleton_blob = parser.get_vertex_buffer(), parser.get_index_buffer(), parser.get_skeleton()
+
+    elements, lods = [], []
+    for element_index, model_element in enumerate(parser.get_model_elements()):
+        material = model_element.material
+        elements.append((element_index, model_element.name, model_element.material_name, material.diffuse_texture if material != None else None,
+                         material.transparency_texture if material != None else None, model_element.skin_index))
+        for lod_level, lod in enumerate(model_element.lods):
+            lods.append((element_index, lod_level, lod.vertex_buffer_begin, lod.vertex_buffer_end, lod.index_buffer_begin, lod.index_buffer_end,
+                         (lod.index_buffer_end - lod.index_buffer_begin) // 3))
+
+    skeleton, bones = None, []
+    if skeletons and skeleton_blob != None and skeleton_blob.size > 0:
+        with BinParser(pathlib.Path(path).with_suffix('.bin'), lazy=True) as bin_parser:
+            buffer = bin_parser.get_buffer(skeleton_blob)
+        names = BoneBinParser(buffer).get_bone_columns().names
+        if names:
+            skeleton = hashlib.blake2b(buffer, digest_size=16).hexdigest()
+            bones = list(enumerate(names))
+
+    stride = vertex_declaration.stride
+    return {
+        'binary_file': parser.get_binary_file(),
+        'vertex_declaration': vertex_declaration_signature(vertex_declaration),
+        'stride': stride,
+        'vertex_size': vertex_buffer.size if vertex_buffer != None else None,
+        'index_size': index_buffer.size if index_buffer != None else None,
+        'skeleton_size': skeleton_blob.size if skeleton_blob != None else None,
+        'vertices': vertex_buffer.size // stride if vertex_buffer != None and stride else 0,
+        'triangles': sum(triangles for _, lod_level, _, _, _, _, triangles in lods if lod_level == 0),
+        'skinned': vertex_declaration.weights.type != VertexElementType.UNUSED and vertex_declaration.indices.type != VertexElementType.UNUSED,
+        'skeletons_scanned': skeletons,
+        'skeleton': skeleton,
+        'elements': elements,
+        'lods': lods,
+        'bones': bones,
+    }
+
+def _read_metadata(path, skeletons):
+    # Failures are kept in the catalog, so unchanged broken files are not parsed again on every scan
+    try:
+        return read_metadata(path, skeletons)
+    except Exception as e:
+        return {'error': str(e) or type(e).__name__}
+
+class CatalogEntry:
+
+    def __init__(self, path, name, vertices, triangles, skinned, skeleton):
+        self.path = path
+        self.name = name
+        self.vertices = vertices
+        self.triangles = triangles
+        self.skinned = skinned
+        self.skeleton = skeleton
+
+class AssetCatalog:
+
+    # SQLite index of the metadata of every asset found under the scanned directories, keyed by absolute
+    # path. Rescans only parse files whose modification time or size changed, and forget deleted ones
+    def __init__(self, path=None):
+        self.path = pathlib.Path(path) if path else default_catalog_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path))
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != CATALOG_VERSION:
+            with self.connection:
+                for (table,) in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+                    self.connection.execute(f'DROP TABLE {table}')
+                self.connection.executescript(SCHEMA)
+                self.connection.execute(f'PRAGMA user_version = {CATALOG_VERSION}')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def scan(self, directory, jobs=None, processes=True, skeletons=False, progress=None):
+        """Catalog the assets under directory, parsing new and modified files in jobs worker processes (threads
+        unless processes), and return the (added, updated, removed, unchanged, failed) counts"""
+        directory = pathlib.Path(directory).resolve()
+        prefix = str(directory) + os.sep
+        known = {path: (asset_id, stamp, skeletons_scanned) for asset_id, path, skeletons_scanned, *stamp in self.connection.execute(
+            'SELECT id, path, skeletons_scanned, xdb_mtime, xdb_size, bin_mtime, bin_size FROM assets WHERE substr(path, 1, ?) = ?', (len(prefix), prefix))}
+
+        # Files once scanned with skeletons keep them when they change
+        stamps, changed, changed_skeletons, unchanged = dict(), [], [], 0
+        for path in find_assets(directory):
+            xdb_stat, bin_stat = path.stat(), path.with_suffix('.bin').stat()
+            stamp = (xdb_stat.st_mtime_ns, xdb_stat.st_size, bin_stat.st_mtime_ns, bin_stat.st_size)
+            stamps[str(path)] = stamp
+            previous = known.get(str(path))
+            if previous != None and tuple(previous[1]) == stamp and (previous[2] or not skeletons):
+                unchanged += 1
+            else:
+                changed.append(path)
+                changed_skeletons.append(skeletons or (previous != None and bool(previous[2])))
+        removed = [asset_id for path, (asset_id, _, _) in known.items() if path not in stamps]
+
+        added, updated, failed = 0, 0, 0
+        with self.connection:
+            for asset_id in removed:
+                self._delete(asset_id)
+            for done, (path, metadata) in enumerate(zip(changed, self._read_all(changed, changed_skeletons, jobs, processes)), 1):
+                previous = known.get(str(path))
+                if previous != None:
+                    self._delete(previous[0])
+                    updated += 1
+                else:
+                    added += 1
+                failed += 'error' in metadata
+                self._insert(path, stamps[str(path)], metadata)
+                if progress != None:
+                    progress(done, len(changed))
+        return added, updated, len(removed), unchanged, failed
+
+    @staticmethod
+    def _read_all(paths, skeletons, jobs, processes):
+        # Metadata of each path, in order
+        if jobs == 1 or len(paths) <= 1:
+            return map(_read_metadata, paths, skeletons)
+        if processes:
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            results = executor.map(_read_metadata, paths, skeletons, chunksize=16)
+        else:
+            executor = ThreadPoolExecutor(max_workers=jobs)
+            results = executor.map(_read_metadata, paths, skeletons)
+        def iterate():
+            with executor:
+                yield from results
+        return iterate()
+
+    def _delete(self, asset_id):
+        for table in ('elements', 'lods', 'bones'):
+            self.connection.execute(f'DELETE FROM {table} WHERE asset = ?', (asset_id,))
+        self.connection.execute('DELETE FROM assets WHERE id = ?', (asset_id,))
+
+    def _insert(self, path, stamp, metadata):
+        name = model_name(path)
+        if 'error' in metadata:
+            self.connection.execute('INSERT INTO assets (path, name, xdb_mtime, xdb_size, bin_mtime, bin_size, skeletons_scanned, error) VALUES (?, ?, ?, ?, ?, ?, 1, ?)',
+                                    (str(path), name, *stamp, metadata['error']))
+            return
+        columns = ('binary_file', 'vertex_declaration', 'stride', 'vertex_size', 'index_size', 'skeleton_size', 'vertices', 'triangles', 'skinned', 'skeletons_scanned', 'skeleton')
+        asset_id = self.connection.execute(
+            f"INSERT INTO assets (path, name, xdb_mtime, xdb_size, bin_mtime, bin_size, {', '.join(columns)}) VALUES ({', '.join('?' * (6 + len(columns)))})",
+            (str(path), name, *stamp, *(metadata[column] for column in columns))).lastrowid
+        self.connection.executemany('INSERT INTO elements VALUES (?, ?, ?, ?, ?, ?, ?)', ((asset_id, *element) for element in metadata['elements']))
+        self.connection.executemany('INSERT INTO lods VALUES (?, ?, ?, ?, ?, ?, ?, ?)', ((asset_id, *lod) for lod in metadata['lods']))
+        self.connection.executemany('INSERT INTO bones VALUES (?, ?, ?)', ((asset_id, *bone) for bone in metadata['bones']))
+
+    def skeleton_of(self, path):
+        row = self.connection.execute('SELECT skeleton FROM assets WHERE path = ?', (str(pathlib.Path(path).resolve()),)).fetchone()
+        return row[0] if row != None else None
+
+    def query(self, name=None, material=None, texture=None, min_triangles=None, max_triangles=None, skinned=None, skeleton=None, bone=None, limit=None):
+        """Cataloged assets matching every given criterion, by path. name, material (of an element) and texture (diffuse or
+        transparency of an element) match case insensitive substrings, triangles count the LOD 0 of all elements, skeleton
+        is a skeleton digest or the path of an asset with the same skeleton and bone a bone name, both need a scan with skeletons"""
+        conditions, parameters = ['error IS NULL'], []
+        if name:
+            conditions.append('instr(lower(name), lower(?)) > 0')
+            parameters.append(name)
+        if material:
+            conditions.append('id IN (SELECT asset FROM elements WHERE instr(lower(material_name), lower(?)) > 0)')
+            parameters.append(material)
+        if texture:
+            conditions.append('id IN (SELECT asset FROM elements WHERE instr(lower(diffuse_texture), lower(?)) > 0 OR instr(lower(transparency_texture), lower(?)) > 0)')
+            parameters += [texture, texture]
+        if min_triangles != None:
+            conditions.append('triangles >= ?')
+            parameters.append(min_triangles)
+        if max_triangles != None:
+            conditions.append('triangles <= ?')
+            parameters.append(max_triangles)
+        if skinned != None:
+            conditions.append('skinned = ?')
+            parameters.append(int(skinned))
+        if skeleton:
+            conditions.append('skeleton = ?')
+            parameters.append(self.skeleton_of(skeleton) or skeleton)
+        if bone:
+            conditions.append('id IN (SELECT asset FROM bones WHERE name = ?)')
+            parameters.append(bone)
+        sql = f"SELECT path, name, vertices, triangles, skinned, skeleton FROM assets WHERE {' AND '.join(conditions)} ORDER BY path"
+        if limit != None:
+            sql += ' LIMIT ?'
+            parameters.append(limit)
+        return [CatalogEntry(pathlib.Path(path), name, vertices, triangles, bool(skinned), skeleton)
+                for path, name, vertices, triangles, skinned, skeleton in self.connection.execute(sql, parameters)]
+
+    def failures(self):
+        return [(pathlib.Path(path), error) for path, error in self.connection.execute('SELECT path, error FROM assets WHERE error IS NOT NULL ORDER BY path')]
+
+DESCRIPTION = 'Index the metadata of Allods Online geometry in a SQLite catalog and query it'
+
+def add_arguments(arguments):
+    arguments.add_argument('--catalog', type=pathlib.Path, default=default_catalog_path(), help=f"catalog file (default: {default_catalog_path()})")
+    commands = arguments.add_subparsers(dest='command', required=True)
+    scan = commands.add_parser('scan', help='catalog the .xdb files of a directory tree, only new and modified files are parsed')
+    scan.add_argument('directory', type=pathlib.Path)
+    scan.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='number of worker processes (default: all cores)')
+    scan.add_argument('--skeletons', action='store_true', help='also inflate the skeleton of each asset, for --skeleton and --bone queries')
+    query = commands.add_parser('query', help='list the cataloged assets matching every option')
+    query.add_argument('--name')
+    query.add_argument('--material')
+    query.add_argument('--texture')
+    query.add_argument('--min-triangles', type=int)
+    query.add_argument('--max-triangles', type=int)
+    query.add_argument('--skinned', action='store_true', default=None)
+    query.add_argument('--skeleton', help='skeleton digest, or path of an asset with the same skeleton')
+    query.add_argument('--bone')
+    query.add_argument('--limit', type=int)
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(prog='python -m allods_geometry catalog', description=DESCRIPTION)
+    add_arguments(arguments)
+    return run(arguments.parse_args(argv))
+
+def run(args):
+    with AssetCatalog(args.catalog) as catalog:
+        if args.command == 'scan':
+            added, updated, removed, unchanged, failed = catalog.scan(args.directory, args.jobs, skeletons=args.skeletons)
+            for path, error in catalog.failures():
+                print(f"{path}: failed: {error}", file=sys.stderr)
+            print(f"{added} added, {updated} updated, {removed} removed, {unchanged} unchanged, {failed} failed")
+            return 0
+        entries = catalog.query(args.name, args.material, args.texture, args.min_triangles, args.max_triangles, args.skinned, args.skeleton, args.bone, args.limit)
+        for entry in entries:
+            print(f"{entry.path}\t{entry.triangles} triangles\t{entry.vertices} vertices" + (f"\tskeleton {entry.skeleton}" if entry.skeleton else ""))
+        return 0
@@ -0,0 +1,64 @@
+import argparse
+import os
+import pathlib
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .asset import load_asset, save_npz
+
+## Batch conversion
+
+def find_assets(source):
+    # Only geometry metadata files come with a .bin archive next to them
+    return [path for path in sorted(source.rglob('*.xdb')) if path.with_suffix('.bin').is_file()]
+
+def convert_asset(xdb_path, output_path):
+    start = time.perf_counter()
+    asset = load_asset(xdb_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    save_npz(asset, output_path)
+    elapsed = time.perf_counter() - start
+    size = xdb_path.stat().st_size + xdb_path.with_suffix('.bin').stat().st_size
+    return size, elapsed
+
+DESCRIPTION = 'Convert Allods Online geometry (.xdb/.bin) to NumPy .npz archives'
+
+def add_arguments(arguments):
+    arguments.add_argument('source', type=pathlib.Path, help='directory searched recursively for .xdb files')
+    arguments.add_argument('output', type=pathlib.Path, help='directory receiving the .npz files, mirroring the source tree')
+    arguments.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='number of worker processes (default: all cores)')
+
+def main(argv=None):
+    arguments = argparse.ArgumentParser(prog='python -m allods_geometry convert', description=DESCRIPTION)
+    add_arguments(arguments)
+    return run(arguments.parse_args(argv))
+
+def run(args):
+    paths = find_assets(args.source)
+    converted, failed, total_size = 0, 0, 0
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = dict()
+        for path in paths:
+            relative_path = path.relative_to(args.source)
+            futures[executor.submit(convert_asset, path, args.output / relative_path.with_suffix('.npz'))] = relative_path
+
+        for future in as_completed(futures):
+            relative_path = futures[future]
+            try:
+                size, elapsed = future.result()
+            except Exception as e:
+                print(f"{relative_path}: failed: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            converted += 1
+            total_size += size
+            print(f"{relative_path}: {size / 1e6:.2f} MB in {elapsed * 1000:.1f} ms ({size / elapsed / 1e6:.1f} MB/s)")
+    wall = time.perf_counter() - start
+
+    print(f"{converted} assets converted, {failed} failed, {total_size / 1e6:.2f} MB in {wall:.2f} s "
+          f"({converted / wall:.1f} assets/s, {total_size / wall / 1e6:.1f} MB/s)")
+    return 1 if failed else 0
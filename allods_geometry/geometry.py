@@ -0,0 +1,153 @@
+from enum import Enum
+
+## Geometry structures
+
+class Vertex:
+    
+    def __init__(self, position, normal, color, texcoord0, texcoord1, weights, indices):
+        self.position = position
+        self.normal = normal
+        self.color = color
+        self.texcoord0 = texcoord0
+        self.texcoord1 = texcoord1
+        self.weights = weights
+        self.indices = indices
+
+class VertexColumns:
+
+    def __init__(self, count, position, normal, color, texcoord0, texcoord1, weights, indices):
+        self.count = count
+        self.position = position
+        self.normal = normal
+        self.color = color
+        self.texcoord0 = texcoord0
+        self.texcoord1 = texcoord1
+        self.weights = weights
+        self.indices = indices
+
+class VertexDeclaration:
+
+    __slots__ = ('position', 'normal', 'color', 'texcoord0', 'texcoord1', 'weights', 'indices', 'stride')
+
+    def __init__(self, position, normal, color, texcoord0, texcoord1, weights, indices, stride):
+        self.position = position
+        self.normal = normal
+        self.color = color
+        self.texcoord0 = texcoord0
+        self.texcoord1 = texcoord1
+        self.weights = weights
+        self.indices = indices
+        self.stride = stride
+
+class VertexComponent:
+
+    __slots__ = ('type', 'offset')
+
+    def __init__(self, type, offset):
+        self.type = type
+        self.offset = offset
+
+class VertexElementType(Enum):
+    FLOAT1 = 1
+    FLOAT2 = 2
+    FLOAT3 = 3
+    FLOAT4 = 4
+    SHORT2 = 5
+    SHORT4 = 6
+    COLOR4 = 7
+    UBYTE4 = 8
+    USHORT2 = 9
+    USHORT4 = 10
+    HALF4 = 11
+    UNUSED = 12
+
+# NumPy (scalar type, component count) of each vertex element type, UNUSED has no storage
+VERTEX_ELEMENT_DTYPES = {
+    VertexElementType.FLOAT1: ('<f4', 1),
+    VertexElementType.FLOAT2: ('<f4', 2),
+    VertexElementType.FLOAT3: ('<f4', 3),
+    VertexElementType.FLOAT4: ('<f4', 4),
+    VertexElementType.SHORT2: ('<i2', 2),
+    VertexElementType.SHORT4: ('<i2', 4),
+    VertexElementType.COLOR4: ('u1', 4),
+    VertexElementType.UBYTE4: ('u1', 4),
+    VertexElementType.USHORT2: ('<u2', 2),
+    VertexElementType.USHORT4: ('<u2', 4),
+    VertexElementType.HALF4: ('<f2', 4),
+    VertexElementType.UNUSED: None,
+}
+
+class Bone:
+
+    def __init__(self, inverted_world_matrix, parent, id, name, local_matrix):
+        self.inverted_world_matrix = inverted_world_matrix
+        self.parent = parent
+        self.id = id
+        self.name = name
+        self.local_matrix = local_matrix
+
+class BoneColumns:
+
+    def __init__(self, count, names, parents, ids, inverted_world_matrices, local_matrices):
+        self.count = count
+        self.names = names
+        self.parents = parents
+        self.ids = ids
+        self.inverted_world_matrices = inverted_world_matrices
+        self.local_matrices = local_matrices
+
+class Blob:
+
+    __slots__ = ('localId', 'size')
+
+    def __init__(self, localId, size):
+        self.localId = localId
+        self.size = size
+
+class ModelElement:
+
+    __slots__ = ('lods', 'name', 'material_name', 'vertex_declaration_id', 'vertex_buffer_offset', 'material', 'skin_index', 'virtual_offset')
+
+    def __init__(self, lods, name, material_name, vertex_declaration_id, vertex_buffer_offset, material, skin_index, virtual_offset):
+        self.lods = lods
+        self.name = name
+        self.material_name = material_name
+        self.vertex_declaration_id = vertex_declaration_id
+        self.vertex_buffer_offset = vertex_buffer_offset
+        self.material = material
+        self.skin_index = skin_index
+        self.virtual_offset = virtual_offset
+
+class GeometryFragment:
+
+    __slots__ = ('vertex_buffer_begin', 'vertex_buffer_end', 'index_buffer_begin', 'index_buffer_end')
+
+    def __init__(self, vertex_buffer_begin, vertex_buffer_end, index_buffer_begin, index_buffer_end):
+        self.vertex_buffer_begin = vertex_buffer_begin
+        self.vertex_buffer_end = vertex_buffer_end
+        self.index_buffer_begin = index_buffer_begin
+        self.index_buffer_end = index_buffer_end
+
+class Material:
+
+    __slots__ = ('blend_effect', 'diffuse_texture', 'scroll_alpha', 'scroll_rgb', 'transparency_texture', 'transparent', 'use_fog', 'u_translate_speed', 'visible', 'v_translate_speed')
+
+    def __init__(self, blend_effect, diffuse_texture, scroll_alpha, scroll_rgb, transparency_texture, transparent, use_fog, u_translate_speed, visible, v_translate_speed):
+        self.blend_effect = blend_effect
+        self.diffuse_texture = diffuse_texture
+        self.scroll_alpha = scroll_alpha
+        self.scroll_rgb = scroll_rgb
+        self.transparency_texture = transparency_texture
+        self.transparent = transparent
+        self.use_fog = use_fog
+        self.u_translate_speed = u_translate_speed
+        self.visible = visible
+        self.v_translate_speed = v_translate_speed
+
+class BlendEffect(Enum):
+
+    BLEND_EFFECT_ADD =0 
+    BLEND_EFFECT_ALPHA = 1
+    BLEND_EFFECT_ALPHA_ADD = 2
+    BLEND_EFFECT_COLOR = 3
+    BLEND_EFFECT_COLOR_ADD = 4   
@@ -0,0 +1,996 @@
+import bpy
+import bpy_extras
+import mathutils
+
+import numpy as np
+
+import cProfile
+import hashlib
+import os
+import pathlib
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .asset import load_asset, lod_ranges, dequantize_normals, dequantize_colors, dequantize_texcoords
+from .cache import GeometryCache, default_cache_directory
+from .catalog import AssetCatalog, default_catalog_path
+from .convert import find_assets
+from .materials import ImageCache, MaterialLibrary, assign_material
+from .profiling import Profiler
+
+def menu_func_import(self, context):
+    self.layout.operator(ImportGeometry.bl_idname, text="Allods Geometry (.bin)")
+
+def register():
+    bpy.utils.register_class(GeometryPreferences)
+    bpy.utils.register_class(ImportGeometry)
+    bpy.utils.register_class(SwitchGeometryLod)
+    bpy.utils.register_class(ImportGeometryLods)
+    bpy.utils.register_class(GeometryLodPanel)
+    bpy.utils.register_class(CatalogResult)
+    bpy.utils.register_class(CatalogSettings)
+    bpy.types.WindowManager.allods_catalog = bpy.props.PointerProperty(type=CatalogSettings)
+    bpy.utils.register_class(ScanGeometryCatalog)
+    bpy.utils.register_class(SearchGeometryCatalog)
+    bpy.utils.register_class(ImportCatalogResults)
+    bpy.utils.register_class(GEOMETRY_UL_catalog_results)
+    bpy.utils.register_class(GeometryCatalogPanel)
+    bpy.types.TOPBAR_MT_file_import.append(menu_func_import)
+
+def unregister():
+    bpy.utils.unregister_class(GeometryCatalogPanel)
+    bpy.utils.unregister_class(GEOMETRY_UL_catalog_results)
+    bpy.utils.unregister_class(ImportCatalogResults)
+    bpy.utils.unregister_class(SearchGeometryCatalog)
+    bpy.utils.unregister_class(ScanGeometryCatalog)
+    del bpy.types.WindowManager.allods_catalog
+    bpy.utils.unregister_class(CatalogSettings)
+    bpy.utils.unregister_class(CatalogResult)
+    bpy.utils.unregister_class(GeometryLodPanel)
+    bpy.utils.unregister_class(ImportGeometryLods)
+    bpy.utils.unregister_class(SwitchGeometryLod)
+    bpy.utils.unregister_class(ImportGeometry)
+    bpy.utils.unregister_class(GeometryPreferences)
+    bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
+
+## Addon preferences
+
+class GeometryPreferences(bpy.types.AddonPreferences):
+    bl_idname = __package__
+
+    use_cache: bpy.props.BoolProperty(
+        name="Cache decoded geometry",
+        description="Keep decoded geometry on disk so re-importing an unchanged asset skips parsing and decoding",
+        default=True,
+    )
+
+    cache_directory: bpy.props.StringProperty(
+        name="Cache directory",
+        description="Where decoded geometry is stored, empty for the default location",
+        subtype='DIR_PATH',
+        default="",
+    )
+
+    cache_size: bpy.props.IntProperty(
+        name="Cache size (MB)",
+        description="Least recently used entries are removed above this size",
+        default=1024,
+        min=1,
+    )
+
+    texture_directory: bpy.props.StringProperty(
+        name="Texture directory",
+        description="Extracted textures, searched after the directory of the .xdb file and the client tree holding it",
+        subtype='DIR_PATH',
+        default="",
+    )
+
+    catalog_path: bpy.props.StringProperty(
+        name="Catalog file",
+        description="SQLite catalog of the scanned asset metadata, empty for the default location",
+        subtype='FILE_PATH',
+        default="",
+    )
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, 'use_cache')
+        column = layout.column()
+        column.enabled = self.use_cache
+        column.prop(self, 'cache_directory')
+        if not self.cache_directory:
+            column.label(text=f"Default: {default_cache_directory()}")
+        column.prop(self, 'cache_size')
+        cache = get_cache(context)
+        if cache != None:
+            column.label(text=f"Session: {cache.hits} hits, {cache.misses} misses")
+        layout.prop(self, 'texture_directory')
+        layout.prop(self, 'catalog_path')
+        if not self.catalog_path:
+            layout.label(text=f"Default: {default_catalog_path()}")
+
+_cache = None
+
+def get_cache(context):
+    # Kept between imports so hit and miss counters cover the whole session
+    global _cache
+    addon = context.preferences.addons.get(__package__)
+    if addon == None or not addon.preferences.use_cache: # classes registered without enabling the addon have no preferences
+        return None
+    preferences = addon.preferences
+    directory = pathlib.Path(bpy.path.abspath(preferences.cache_directory)) if preferences.cache_directory else default_cache_directory()
+    max_size = preferences.cache_size * 1024 * 1024
+    if _cache == None or _cache.directory != directory:
+        _cache = GeometryCache(directory, max_size)
+    _cache.max_size = max_size
+    return _cache
+
+def get_catalog(context):
+    addon = context.preferences.addons.get(__package__)
+    catalog_path = addon.preferences.catalog_path if addon != None else ""
+    return AssetCatalog(pathlib.Path(bpy.path.abspath(catalog_path)) if catalog_path else None)
+
+## Addon main code
+
+class ImportGeometry(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
+    """Load geometry files from Allods Online"""
+    bl_idname = "allods.import_geometry"
+    bl_label = "Import geometry"
+
+    filter_glob: bpy.props.StringProperty(
+        default="*.xdb",
+        options={'HIDDEN'},
+    )
+
+    files: bpy.props.CollectionProperty(
+        type=bpy.types.OperatorFileListElement,
+        options={'HIDDEN', 'SKIP_SAVE'},
+    )
+
+    directory: bpy.props.StringProperty(
+        subtype='DIR_PATH',
+        options={'HIDDEN', 'SKIP_SAVE'},
+    )
+
+    import_directory: bpy.props.BoolProperty(
+        name="Whole directory",
+        description="Import every .xdb file with a .bin file in the directory and its subdirectories instead of the selected files",
+        default=False,
+    )
+
+    threads: bpy.props.IntProperty(
+        name="Decoding threads",
+        description="Files decoded in parallel while meshes are created, 0 for one per core",
+        default=0,
+        min=0,
+    )
+
+    import_lods: bpy.props.BoolProperty(
+        name="Import LODs",
+        description="Import all LOD models",
+        default=False,
+    )
+
+    import_skeleton: bpy.props.BoolProperty(
+        name="Import skeleton",
+        description="Import the skeleton of skinned models as an armature deforming their meshes",
+        default=True,
+    )
+
+    import_normals: bpy.props.BoolProperty(
+        name="Import normals",
+        description="Use the vertex normals of the model as custom normals instead of normals computed by Blender",
+        default=True,
+    )
+
+    import_colors: bpy.props.BoolProperty(
+        name="Import vertex colors",
+        description="Add the vertex colors of models that have them as a color attribute",
+        default=True,
+    )
+
+    import_texcoord1: bpy.props.BoolProperty(
+        name="Import second UV map",
+        description="Add the second texture coordinates of models that have them as another UV map",
+        default=True,
+    )
+
+    import_materials: bpy.props.BoolProperty(
+        name="Import materials",
+        description="Create materials with the textures found next to the .xdb file or in the texture directory of the preferences",
+        default=True,
+    )
+
+    duplicates: bpy.props.EnumProperty(
+        name="Duplicates",
+        description="What to do with geometry identical to geometry already in the file",
+        items=(
+            ('COPY', "Copy", "Always create new mesh data"),
+            ('SHARE', "Share meshes", "Create new objects using the existing mesh data of identical geometry"),
+            ('INSTANCE', "Instance", "Add an instance of the collection of an identical import, share meshes otherwise"),
+        ),
+        default='COPY',
+    )
+
+    profiling: bpy.props.EnumProperty(
+        name="Profiling",
+        description="Extra measurements of the import stages, their time is always reported",
+        items=(
+            ('NONE', "None", "Only report the time spent in each import stage"),
+            ('TRACE', "Trace", "Also report the peak memory and write a JSON trace of the stages next to the .xdb file"),
+            ('CPROFILE', "cProfile", "Run the import under cProfile and write its stats next to the .xdb file"),
+        ),
+        default='NONE',
+    )
+
+    def get_attributes(self):
+        # Optional vertex attributes to import, see get_fragment_mesh
+        options = (('normal', self.import_normals), ('color', self.import_colors), ('texcoord1', self.import_texcoord1))
+        return {name for name, enabled in options if enabled}
+
+    def get_paths(self):
+        directory = pathlib.Path(self.directory) if self.directory else pathlib.Path(self.filepath).parent
+        if self.import_directory:
+            return find_assets(directory)
+        names = [file.name for file in self.files if file.name]
+        if names:
+            return [directory / name for name in names]
+        return [pathlib.Path(self.filepath)]
+
+    def execute(self, context):
+        paths = self.get_paths()
+        if not paths:
+            self.report({'ERROR'}, f"No geometry to import in {self.directory}")
+            return {'CANCELLED'}
+
+        profiler = Profiler(trace=self.profiling == 'TRACE', track_memory=self.profiling == 'TRACE')
+        profiler.start()
+        if self.profiling == 'CPROFILE':
+            # cProfile only sees the calling thread, files are decoded on it
+            profile = cProfile.Profile()
+            result = profile.runcall(self.import_files, context, paths, profiler, 1)
+            stats_path = profile_path(paths, '.prof')
+            profile.dump_stats(stats_path)
+            self.report({'INFO'}, f"cProfile stats written to {stats_path}")
+        else:
+            result = self.import_files(context, paths, profiler, self.threads or os.cpu_count())
+        profiler.stop()
+
+        self.report({'INFO'}, f"Import {profiler.summary()}")
+        if self.profiling == 'TRACE':
+            trace_path = profile_path(paths, '.trace.json')
+            profiler.write_trace(trace_path)
+            self.report({'INFO'}, f"Trace written to {trace_path}")
+        return result
+
+    def import_files(self, context, paths, profiler, threads):
+        cache = get_cache(context)
+        fingerprints = self.duplicates != 'COPY'
+        existing_meshes = dict()
+        if fingerprints:
+            existing_meshes = {mesh[FINGERPRINT_PROPERTY]: mesh for mesh in bpy.data.meshes if FINGERPRINT_PROPERTY in mesh}
+        materials = None
+        if self.import_materials:
+            addon = context.preferences.addons.get(__package__)
+            texture_directory = bpy.path.abspath(addon.preferences.texture_directory) if addon != None and addon.preferences.texture_directory else None
+            materials = MaterialLibrary(ImageCache(texture_directory))
+        window_manager = context.window_manager
+        window_manager.progress_begin(0, len(paths))
+        imported = 0
+        try:
+            # Files are decoded in worker threads, where zlib and NumPy release the GIL,
+            # while the main thread creates the Blender data of those already decoded
+            decoded_assets = decode_assets(paths, cache, self.import_lods, fingerprints, self.import_skeleton, profiler, threads)
+            for done, (path, decoded, worker_profiler) in enumerate(decoded_assets, 1):
+                profiler.merge(worker_profiler)
+                if isinstance(decoded, Exception):
+                    self.report({'WARNING'}, f"Could not import {path}: {decoded}")
+                else:
+                    asset, fragments = decoded
+                    self.build_asset(context, path, asset, fragments, existing_meshes, materials, profiler)
+                    imported += 1
+                window_manager.progress_update(done)
+        finally:
+            window_manager.progress_end()
+
+        if cache != None:
+            self.report({'INFO'}, f"Geometry cache: {cache.hits} hits, {cache.misses} misses")
+        if materials != None:
+            images = materials.images
+            self.report({'INFO'}, f"Materials: {materials.misses} created, {materials.hits} reused. Images: {images.misses} loaded, {images.hits} reused, {len(images.missing)} not found")
+        counters = profiler.counters
+        if 'vertex_groups' in counters:
+            skin_time = profiler.totals['skin_weights'] + profiler.totals['bind_skin']
+            self.report({'INFO'}, f"Skin weights: {counters['vertex_groups']} vertex groups from {counters['skin_batches']} batches in {skin_time * 1000:.1f} ms")
+        if fingerprints:
+            self.report({'INFO'}, f"{counters.get('reused_meshes', 0)} of {counters.get('fragments', 0)} meshes reused, about {counters.get('saved_bytes', 0) / 1e6:.2f} MB saved")
+        if len(paths) > 1:
+            self.report({'INFO'}, f"Imported {imported} of {len(paths)} files")
+
+        return {'FINISHED'} if imported > 0 else {'CANCELLED'}
+
+    def build_asset(self, context, path, asset, fragments, existing_meshes, materials, profiler):
+        model_name = asset.name
+        profiler.count('fragments', len(fragments))
+
+        # Whole imports are identified by the fingerprints of all their meshes
+        import_fingerprint = None
+        if self.duplicates != 'COPY':
+            import_fingerprint = hashlib.blake2b('\n'.join(fingerprint for _, _, _, fingerprint, _ in fragments).encode('utf-8'), digest_size=16).hexdigest()
+
+        if self.duplicates == 'INSTANCE':
+            for collection in bpy.data.collections:
+                if collection.get(FINGERPRINT_PROPERTY) == import_fingerprint:
+                    with profiler.span('verify_collection'):
+                        unchanged = collection_unchanged(collection, fragments)
+                    if not unchanged:
+                        # Edited since it was imported, no longer instanced
+                        del collection[FINGERPRINT_PROPERTY]
+                        continue
+                    instance = bpy.data.objects.new(model_name, None)
+                    instance.instance_type = 'COLLECTION'
+                    instance.instance_collection = collection
+                    bpy.context.scene.collection.objects.link(instance)
+                    profiler.count('objects')
+                    self.report({'INFO'}, f"Instanced collection {collection.name}, no mesh created")
+                    return
+
+        root_collection =  bpy.data.collections.new(model_name)
+        bpy.context.scene.collection.children.link(root_collection)
+        if import_fingerprint != None:
+            root_collection[FINGERPRINT_PROPERTY] = import_fingerprint
+        # Enough to build other LODs later, see SwitchGeometryLod
+        root_collection[SOURCE_PROPERTY] = str(path)
+        root_collection[LOD_RANGES_PROPERTY] = lod_ranges(asset).ravel().tolist()
+
+        lod_collections = dict()
+        lod_collections[0] = root_collection
+
+        armature_object = None
+        if self.import_skeleton and asset.is_skinned():
+            with profiler.span('armature'):
+                armature_object = build_armature(context, f"{model_name}_skeleton", asset.skeleton, asset.get_bind_matrices(), root_collection)
+            profiler.count('objects')
+
+        element_materials = dict()
+        for model_element, lod_level, lod, fingerprint, influences in fragments:
+
+            mesh_name = fragment_name(model_element, lod_level)
+            mesh, reused = get_fragment_mesh(asset, model_element, lod_level, fingerprint, existing_meshes, profiler, self.get_attributes())
+
+            with profiler.span('objects'):
+                mesh_object = bpy.data.objects.new(mesh_name, mesh)
+                mesh_object[ELEMENT_PROPERTY] = asset.model_elements.index(model_element)
+                mesh_object[LOD_PROPERTY] = lod_level
+                if armature_object != None:
+                    mesh_object.parent = armature_object
+                    modifier = mesh_object.modifiers.new('Armature', 'ARMATURE')
+                    modifier.object = armature_object
+            profiler.count('objects')
+
+            if materials != None:
+                # Resolved once per element, shared by its LODs
+                with profiler.span('materials'):
+                    element_index = mesh_object[ELEMENT_PROPERTY]
+                    if element_index not in element_materials:
+                        element_materials[element_index] = materials.get(model_element, path)
+                    if element_materials[element_index] != None:
+                        assign_material(mesh_object, element_materials[element_index])
+
+            if armature_object != None:
+                with profiler.span('bind_skin', mesh=mesh_name):
+                    profiler.count('vertex_groups', bind_skin(mesh_object, asset.skeleton.names, influences, add_weights=not reused))
+                profiler.count('skin_batches', len(influences))
+
+                if model_element.skin_index != 0:
+                    self.report({'WARNING'}, f"{model_element.name} uses skin {model_element.skin_index}, its bones may be wrong")
+
+            with profiler.span('link'):
+                if lod_level not in lod_collections:
+                    lod_collection = bpy.data.collections.new(f"{model_name}_lod{lod_level}")
+                    root_collection.children.link(lod_collection)
+                    lod_collections[lod_level] = lod_collection
+                else:
+                    lod_collection = lod_collections[lod_level]
+                lod_collection.objects.link(mesh_object)
+
+## LOD switching
+
+class SwitchGeometryLod(bpy.types.Operator):
+    """Replace the mesh of imported objects with another LOD, decoded again from the source files or the geometry cache"""
+    bl_idname = "allods.switch_lod"
+    bl_label = "Switch LOD"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    lod_level: bpy.props.IntProperty(
+        name="LOD",
+        description="LOD level to show, elements with fewer LODs show their last one",
+        default=0,
+        min=0,
+    )
+
+    selected_only: bpy.props.BoolProperty(
+        name="Selected only",
+        description="Switch the selected objects only, otherwise every object of the imports they belong to",
+        default=True,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return any(ELEMENT_PROPERTY in mesh_object for mesh_object in context.selected_objects)
+
+    def execute(self, context):
+        profiler = Profiler()
+        profiler.start()
+        cache = get_cache(context)
+        existing_meshes = {mesh[FINGERPRINT_PROPERTY]: mesh for mesh in bpy.data.meshes if FINGERPRINT_PROPERTY in mesh}
+
+        switched = 0
+        for root_collection, mesh_objects in imported_objects(context, self.selected_only):
+            path = root_collection[SOURCE_PROPERTY]
+            try:
+                asset = cache.load_asset(path, profiler) if cache != None else load_asset(path, profiler)
+            except Exception as e:
+                self.report({'WARNING'}, f"Could not load {path}: {e}")
+                continue
+            if not np.array_equal(np.reshape(root_collection[LOD_RANGES_PROPERTY], (-1, 7)), lod_ranges(asset)):
+                self.report({'WARNING'}, f"{path} changed since {root_collection.name} was imported, import it again")
+                continue
+
+            for mesh_object in mesh_objects:
+                model_element = asset.model_elements[mesh_object[ELEMENT_PROPERTY]]
+                lod_level = min(self.lod_level, len(model_element.lods) - 1)
+                if mesh_object[LOD_PROPERTY] == lod_level and mesh_object.data != None:
+                    continue
+
+                # Meshes are tagged with their fingerprint so that switching back reuses them
+                with profiler.span('fingerprint'):
+                    fingerprint = asset.get_fingerprint(model_element, lod_level)
+                mesh, reused = get_fragment_mesh(asset, model_element, lod_level, fingerprint, existing_meshes, profiler, mesh_attributes(mesh_object.data))
+                material = mesh_object.material_slots[0].material if mesh_object.material_slots else None
+                mesh_object.data = mesh
+                mesh_object[LOD_PROPERTY] = lod_level
+                if material != None:
+                    assign_material(mesh_object, material)
+
+                if asset.is_skinned() and any(modifier.type == 'ARMATURE' for modifier in mesh_object.modifiers):
+                    if bpy.app.version < (3, 0, 0): # groups belong to the object and were made for the previous LOD
+                        mesh_object.vertex_groups.clear()
+                        reused = False
+                    with profiler.span('bind_skin'):
+                        bind_skin(mesh_object, asset.skeleton.names, asset.get_skin_weights(model_element, lod_level), add_weights=not reused)
+                switched += 1
+        profiler.stop()
+
+        self.report({'INFO'}, f"Switched {switched} objects to LOD {self.lod_level} in {profiler.summary()}")
+        return {'FINISHED'}
+
+class ImportGeometryLods(bpy.types.Operator):
+    """Add objects for the LODs of imported model elements that have none yet, next to the objects of the element"""
+    bl_idname = "allods.import_lods"
+    bl_label = "Import all LODs"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    selected_only: bpy.props.BoolProperty(
+        name="Selected only",
+        description="Add the LODs of the elements of the selected objects only, otherwise of every element of the imports they belong to",
+        default=True,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return any(ELEMENT_PROPERTY in mesh_object for mesh_object in context.selected_objects)
+
+    def execute(self, context):
+        profiler = Profiler()
+        profiler.start()
+        cache = get_cache(context)
+        existing_meshes = {mesh[FINGERPRINT_PROPERTY]: mesh for mesh in bpy.data.meshes if FINGERPRINT_PROPERTY in mesh}
+
+        added = 0
+        for root_collection, mesh_objects in imported_objects(context, self.selected_only):
+            path = root_collection[SOURCE_PROPERTY]
+            try:
+                asset = cache.load_asset(path, profiler) if cache != None else load_asset(path, profiler)
+            except Exception as e:
+                self.report({'WARNING'}, f"Could not load {path}: {e}")
+                continue
+            if not np.array_equal(np.reshape(root_collection[LOD_RANGES_PROPERTY], (-1, 7)), lod_ranges(asset)):
+                self.report({'WARNING'}, f"{path} changed since {root_collection.name} was imported, import it again")
+                continue
+
+            # LODs already shown by an object of the import, per element
+            element_lods = dict()
+            for mesh_object in root_collection.all_objects:
+                if ELEMENT_PROPERTY in mesh_object:
+                    element_lods.setdefault(mesh_object[ELEMENT_PROPERTY], set()).add(mesh_object[LOD_PROPERTY])
+            lod_collections = import_lod_collections(root_collection)
+
+            for mesh_object in mesh_objects:
+                element_index = mesh_object[ELEMENT_PROPERTY]
+                model_element = asset.model_elements[element_index]
+                material = mesh_object.material_slots[0].material if mesh_object.material_slots else None
+                for lod_level in range(len(model_element.lods)):
+                    if lod_level in element_lods[element_index]:
+                        continue
+                    element_lods[element_index].add(lod_level)
+
+                    with profiler.span('fingerprint'):
+                        fingerprint = asset.get_fingerprint(model_element, lod_level)
+                    mesh, reused = get_fragment_mesh(asset, model_element, lod_level, fingerprint, existing_meshes, profiler, mesh_attributes(mesh_object.data))
+
+                    with profiler.span('objects'):
+                        lod_object = bpy.data.objects.new(fragment_name(model_element, lod_level), mesh)
+                        lod_object[ELEMENT_PROPERTY] = element_index
+                        lod_object[LOD_PROPERTY] = lod_level
+                        lod_object.parent = mesh_object.parent
+                        lod_object.matrix_parent_inverse = mesh_object.matrix_parent_inverse
+                        lod_object.matrix_basis = mesh_object.matrix_basis
+                        for modifier in mesh_object.modifiers:
+                            if modifier.type == 'ARMATURE':
+                                lod_object.modifiers.new(modifier.name, 'ARMATURE').object = modifier.object
+                    if material != None:
+                        assign_material(lod_object, material)
+
+                    if asset.is_skinned() and any(modifier.type == 'ARMATURE' for modifier in lod_object.modifiers):
+                        with profiler.span('bind_skin'):
+                            # Before Blender 3.0 groups belong to the object, and the new object has none
+                            bind_skin(lod_object, asset.skeleton.names, asset.get_skin_weights(model_element, lod_level), add_weights=not reused or bpy.app.version < (3, 0, 0))
+
+                    if lod_level not in lod_collections:
+                        lod_collections[lod_level] = bpy.data.collections.new(f"{asset.name}_lod{lod_level}")
+                        root_collection.children.link(lod_collections[lod_level])
+                    lod_collections[lod_level].objects.link(lod_object)
+                    added += 1
+        profiler.stop()
+
+        self.report({'INFO'}, f"Added {added} LOD objects in {profiler.summary()}")
+        return {'FINISHED'}
+
+class GeometryLodPanel(bpy.types.Panel):
+    """LOD levels of the active imported object"""
+    bl_idname = "VIEW3D_PT_allods_geometry_lod"
+    bl_label = "Allods LOD"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "Allods"
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object != None and ELEMENT_PROPERTY in context.active_object
+
+    def draw(self, context):
+        layout = self.layout
+        mesh_object = context.active_object
+        root_collection = import_collection(mesh_object)
+        if root_collection == None:
+            layout.label(text="Import collection not found")
+            return
+
+        ranges = np.reshape(root_collection[LOD_RANGES_PROPERTY], (-1, 7))
+        element_ranges = ranges[ranges[:, 0] == mesh_object[ELEMENT_PROPERTY]]
+        layout.label(text=f"{root_collection.name}: LOD {mesh_object[LOD_PROPERTY]} of {len(element_ranges)}")
+
+        for selected_only, text in ((True, "Selected objects"), (False, "Whole imports")):
+            column = layout.column(align=True)
+            column.label(text=text)
+            for lod_level, index_begin, index_end in element_ranges[:, [1, 5, 6]].tolist():
+                operator = column.operator(SwitchGeometryLod.bl_idname, text=f"LOD {lod_level}: {(index_end - index_begin) // 3} triangles",
+                                           depress=lod_level == mesh_object[LOD_PROPERTY])
+                operator.lod_level = lod_level
+                operator.selected_only = selected_only
+            column.operator(ImportGeometryLods.bl_idname, text="Import all LODs").selected_only = selected_only
+
+## Asset catalog
+
+class CatalogResult(bpy.types.PropertyGroup):
+    path: bpy.props.StringProperty()
+    triangles: bpy.props.IntProperty()
+    vertices: bpy.props.IntProperty()
+
+class CatalogSettings(bpy.types.PropertyGroup):
+    directory: bpy.props.StringProperty(
+        name="Directory",
+        description="Extracted client directory to catalog",
+        subtype='DIR_PATH',
+    )
+
+    skeletons: bpy.props.BoolProperty(
+        name="Skeletons",
+        description="Also read the skeleton of each asset from its .bin file, to search by bone",
+        default=False,
+    )
+
+    name: bpy.props.StringProperty(name="Name", description="Part of the asset name")
+    material: bpy.props.StringProperty(name="Material", description="Part of a material name")
+    texture: bpy.props.StringProperty(name="Texture", description="Part of a diffuse or transparency texture path")
+    bone: bpy.props.StringProperty(name="Bone", description="Name of a bone of the skeleton")
+    min_triangles: bpy.props.IntProperty(name="Min triangles", description="Triangles of the best LOD, 0 for any", min=0)
+    max_triangles: bpy.props.IntProperty(name="Max triangles", description="Triangles of the best LOD, 0 for any", min=0)
+    skinned_only: bpy.props.BoolProperty(name="Skinned only", default=False)
+
+    results: bpy.props.CollectionProperty(type=CatalogResult)
+    active_result: bpy.props.IntProperty()
+
+class ScanGeometryCatalog(bpy.types.Operator):
+    """Catalog the metadata of the .xdb files of the directory, only new and modified files are parsed"""
+    bl_idname = "allods.catalog_scan"
+    bl_label = "Scan"
+
+    def execute(self, context):
+        settings = context.window_manager.allods_catalog
+        directory = pathlib.Path(bpy.path.abspath(settings.directory))
+        if not settings.directory or not directory.is_dir():
+            self.report({'ERROR'}, "Choose a directory to scan")
+            return {'CANCELLED'}
+        window_manager = context.window_manager
+        window_manager.progress_begin(0, 1)
+        try:
+            # Worker processes would start Blender executables, threads are used instead
+            with get_catalog(context) as catalog:
+                added, updated, removed, unchanged, failed = catalog.scan(directory, os.cpu_count(), processes=False, skeletons=settings.skeletons,
+                                                                          progress=lambda done, total: window_manager.progress_update(done / total))
+        finally:
+            window_manager.progress_end()
+        self.report({'WARNING'} if failed else {'INFO'}, f"Catalog: {added} added, {updated} updated, {removed} removed, {unchanged} unchanged, {failed} failed")
+        return {'FINISHED'}
+
+class SearchGeometryCatalog(bpy.types.Operator):
+    """List the cataloged assets matching every search field"""
+    bl_idname = "allods.catalog_search"
+    bl_label = "Search"
+
+    def execute(self, context):
+        settings = context.window_manager.allods_catalog
+        with get_catalog(context) as catalog:
+            entries = catalog.query(settings.name, settings.material, settings.texture, settings.min_triangles or None, settings.max_triangles or None,
+                                    True if settings.skinned_only else None, None, settings.bone)
+        settings.results.clear()
+        for entry in entries:
+            result = settings.results.add()
+            result.name = entry.name
+            result.path = str(entry.path)
+            result.triangles = entry.triangles
+            result.vertices = entry.vertices
+        settings.active_result = 0
+        self.report({'INFO'}, f"{len(entries)} assets found")
+        return {'FINISHED'}
+
+class ImportCatalogResults(bpy.types.Operator):
+    """Import the active search result, or all of them"""
+    bl_idname = "allods.catalog_import"
+    bl_label = "Import"
+
+    all_results: bpy.props.BoolProperty(default=False)
+
+    def execute(self, context):
+        settings = context.window_manager.allods_catalog
+        if self.all_results:
+            paths = [result.path for result in settings.results]
+        elif 0 <= settings.active_result < len(settings.results):
+            paths = [settings.results[settings.active_result].path]
+        else:
+            paths = []
+        paths = [path for path in paths if pathlib.Path(path).is_file()]
+        if not paths:
+            self.report({'ERROR'}, "No cataloged file to import, scan the directory again")
+            return {'CANCELLED'}
+        # Files of several directories are given relative to their common directory
+        directory = os.path.commonpath([os.path.dirname(path) for path in paths])
+        return bpy.ops.allods.import_geometry('EXEC_DEFAULT', directory=directory, files=[{'name': os.path.relpath(path, directory)} for path in paths])
+
+class GEOMETRY_UL_catalog_results(bpy.types.UIList):
+
+    def draw_item(self, context, layout, data, item, icon, active_data, active_property, index=0, flt_flag=0):
+        row = layout.row()
+        row.label(text=item.name, icon='MESH_DATA')
+        row.label(text=f"{item.triangles} triangles")
+
+class GeometryCatalogPanel(bpy.types.Panel):
+    """Search the asset catalog and import from the results"""
+    bl_idname = "VIEW3D_PT_allods_geometry_catalog"
+    bl_label = "Allods Catalog"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "Allods"
+
+    def draw(self, context):
+        layout = self.layout
+        settings = context.window_manager.allods_catalog
+
+        row = layout.row(align=True)
+        row.prop(settings, 'directory', text="")
+        row.prop(settings, 'skeletons', text="", icon='ARMATURE_DATA')
+        row.operator(ScanGeometryCatalog.bl_idname, text="", icon='FILE_REFRESH')
+
+        column = layout.column(align=True)
+        for name in ('name', 'material', 'texture', 'bone', 'min_triangles', 'max_triangles', 'skinned_only'):
+            column.prop(settings, name)
+        layout.operator(SearchGeometryCatalog.bl_idname, icon='VIEWZOOM')
+
+        layout.template_list('GEOMETRY_UL_catalog_results', "", settings, 'results', settings, 'active_result')
+        row = layout.row(align=True)
+        row.operator(ImportCatalogResults.bl_idname, text="Import").all_results = False
+        row.operator(ImportCatalogResults.bl_idname, text=f"Import all {len(settings.results)}").all_results = True
+
+# Custom property holding the geometry fingerprint of imported meshes and collections
+FINGERPRINT_PROPERTY = 'allods_fingerprint'
+
+# Custom property holding the hash of the data of fingerprinted meshes, meshes edited since are not reused
+MESH_HASH_PROPERTY = 'allods_mesh_hash'
+
+# Custom properties of import root collections (source .xdb path, lod_ranges rows) and of
+# their objects (model element index and LOD level), used to switch LODs after the import
+SOURCE_PROPERTY = 'allods_source'
+LOD_RANGES_PROPERTY = 'allods_lod_ranges'
+ELEMENT_PROPERTY = 'allods_element'
+LOD_PROPERTY = 'allods_lod'
+
+def import_collection(mesh_object):
+    for collection in bpy.data.collections:
+        if SOURCE_PROPERTY in collection and mesh_object.name in collection.all_objects:
+            return collection
+    return None
+
+def import_lod_collections(root_collection):
+    # Collections of the objects of each LOD of an import, LOD 0 is in the root collection
+    lod_collections = {0: root_collection}
+    for collection in root_collection.children:
+        for mesh_object in collection.objects:
+            if LOD_PROPERTY in mesh_object:
+                lod_collections.setdefault(mesh_object[LOD_PROPERTY], collection)
+    return lod_collections
+
+def imported_objects(context, selected_only):
+    # (root collection, objects) of the imports of the selected objects, with only the selected objects or all of them
+    selected = {mesh_object.name for mesh_object in context.selected_objects if ELEMENT_PROPERTY in mesh_object}
+    groups = []
+    for collection in bpy.data.collections:
+        if SOURCE_PROPERTY in collection:
+            mesh_objects = [mesh_object for mesh_object in collection.all_objects if ELEMENT_PROPERTY in mesh_object]
+            if any(mesh_object.name in selected for mesh_object in mesh_objects):
+                groups.append((collection, [mesh_object for mesh_object in mesh_objects if not selected_only or mesh_object.name in selected]))
+    return groups
+
+def fragment_name(model_element, lod_level):
+    return f"{model_element.name}_lod{lod_level}" if lod_level > 0 else model_element.name
+
+def mesh_attributes(mesh):
+    # Optional vertex attributes imported into a mesh from get_fragment_mesh
+    attributes = set()
+    if mesh != None:
+        if mesh.has_custom_normals:
+            attributes.add('normal')
+        if len(mesh.color_attributes if hasattr(mesh, 'color_attributes') else mesh.vertex_colors) > 0:
+            attributes.add('color')
+        if len(mesh.uv_layers) > 1:
+            attributes.add('texcoord1')
+    return attributes
+
+def get_fragment_mesh(asset, model_element, lod_level, fingerprint, existing_meshes, profiler, attributes=frozenset()):
+    """Mesh of a LOD with the optional vertex attributes ('normal', 'color', 'texcoord1') the asset has, the one of
+    identical geometry and attributes in existing_meshes if any, returns (mesh, reused)"""
+    mesh_name = fragment_name(model_element, lod_level)
+    lod_vertices = asset.get_vertex_range(model_element, model_element.lods[lod_level])
+    with profiler.span('triangles'):
+        triangles = asset.get_triangles(model_element, lod_level)
+    profiler.count('vertices', lod_vertices.stop - lod_vertices.start)
+    profiler.count('triangles', len(triangles))
+
+    # Meshes built with other attributes are not reused
+    vertices = asset.vertices
+    attributes = sorted(name for name in attributes if getattr(vertices, name) is not None)
+    if fingerprint != None and attributes:
+        fingerprint = f"{fingerprint}+{'+'.join(attributes)}"
+
+    if fingerprint in existing_meshes:
+        mesh = existing_meshes[fingerprint]
+        with profiler.span('verify_mesh'):
+            unchanged = mesh_unchanged(mesh)
+        if unchanged:
+            profiler.count('reused_meshes')
+            profiler.count('saved_bytes', mesh_size(lod_vertices.stop - lod_vertices.start, len(triangles)))
+            return mesh, True
+        # Edited since it was built, its tag is dropped and the geometry built again
+        del existing_meshes[fingerprint]
+        del mesh[FINGERPRINT_PROPERTY]
+
+    with profiler.span(f"mesh_build_lod{lod_level}", mesh=mesh_name):
+        mesh = build_mesh(mesh_name, vertices.position[lod_vertices, :3], triangles)
+    with profiler.span('uv_layer', mesh=mesh_name):
+        add_uv_layer(mesh, triangles, vertices.texcoord0[lod_vertices, :2])
+    if 'texcoord1' in attributes:
+        with profiler.span('uv_layer', mesh=mesh_name):
+            add_uv_layer(mesh, triangles, dequantize_texcoords(vertices.texcoord1[lod_vertices]), 'UVMap1')
+    if 'color' in attributes:
+        with profiler.span('colors', mesh=mesh_name):
+            add_color_attribute(mesh, triangles, dequantize_colors(vertices.color[lod_vertices]))
+    if 'normal' in attributes:
+        with profiler.span('normals', mesh=mesh_name):
+            set_custom_normals(mesh, dequantize_normals(vertices.normal[lod_vertices]))
+    if fingerprint != None:
+        mesh[FINGERPRINT_PROPERTY] = fingerprint
+        with profiler.span('mesh_hash', mesh=mesh_name):
+            mesh[MESH_HASH_PROPERTY] = mesh_hash(mesh)
+        existing_meshes[fingerprint] = mesh
+    profiler.count('meshes')
+    return mesh, False
+
+def mesh_hash(mesh):
+    # Vertex positions, loop vertices, polygon loop starts and UVs of a mesh, read in bulk
+    digest = hashlib.blake2b(np.array([len(mesh.vertices), len(mesh.loops), len(mesh.polygons), len(mesh.uv_layers)], dtype=np.int64).tobytes(), digest_size=16)
+    for collection, attribute, size, dtype in ((mesh.vertices, 'co', 3, np.float32), (mesh.loops, 'vertex_index', 1, np.int32), (mesh.polygons, 'loop_start', 1, np.int32)):
+        values = np.empty(len(collection) * size, dtype=dtype)
+        collection.foreach_get(attribute, values)
+        digest.update(values.tobytes())
+    for uv_layer in mesh.uv_layers:
+        values = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        uv_layer.data.foreach_get('uv', values)
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+def mesh_unchanged(mesh):
+    # Meshes tagged before their data was hashed are not trusted either
+    return MESH_HASH_PROPERTY in mesh and mesh[MESH_HASH_PROPERTY] == mesh_hash(mesh)
+
+def collection_unchanged(collection, fragments):
+    # Collection of an import still holding one object per fragment, with the mesh it was built with
+    mesh_objects = [mesh_object for mesh_object in collection.all_objects if ELEMENT_PROPERTY in mesh_object]
+    if len(mesh_objects) != len(fragments) or any(mesh_object.data == None or FINGERPRINT_PROPERTY not in mesh_object.data for mesh_object in mesh_objects):
+        return False
+    # Mesh fingerprints carry the optional attributes after the geometry fingerprint
+    if sorted(mesh_object.data[FINGERPRINT_PROPERTY].split('+', 1)[0] for mesh_object in mesh_objects) != sorted(fingerprint for _, _, _, fingerprint, _ in fragments):
+        return False
+    return all(mesh_unchanged(mesh) for mesh in {mesh_object.data for mesh_object in mesh_objects})
+
+def profile_path(paths, suffix):
+    # Profiling output is written next to the imported .xdb file, or in the directory of several ones
+    if len(paths) == 1:
+        return paths[0].with_name(paths[0].name + suffix)
+    return pathlib.Path(os.path.commonpath(paths)) / f"allods_import{suffix}"
+
+def decode_asset(path, cache, import_lods, fingerprints, skin_weights, profiler):
+    """Decode the asset at path and list its (model element, LOD level, LOD, fingerprint, skin weights) fragments to import,
+    everything that does not need Blender"""
+    asset = cache.load_asset(path, profiler) if cache != None else load_asset(path, profiler)
+    skin_weights = skin_weights and asset.is_skinned()
+    fragments = []
+    for model_element in asset.model_elements:
+        for lod_level, lod in enumerate(model_element.lods):
+            if not import_lods and lod_level > 0:
+                break
+            fingerprint, influences = None, None
+            if fingerprints:
+                with profiler.span('fingerprint'):
+                    fingerprint = asset.get_fingerprint(model_element, lod_level)
+            if skin_weights:
+                with profiler.span('skin_weights'):
+                    influences = asset.get_skin_weights(model_element, lod_level)
+            fragments.append((model_element, lod_level, lod, fingerprint, influences))
+    return asset, fragments
+
+def decode_assets(paths, cache, import_lods, fingerprints, skin_weights, profiler, threads):
+    # Yields (path, (asset, fragments) or the exception raised, profiler of the decoding) as each file is decoded
+    def decode(path, worker_profiler):
+        try:
+            return path, decode_asset(path, cache, import_lods, fingerprints, skin_weights, worker_profiler), worker_profiler
+        except Exception as e:
+            return path, e, worker_profiler
+
+    if threads == 1 or len(paths) == 1:
+        for path in paths:
+            yield decode(path, profiler.fork())
+        return
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(decode, path, profiler.fork()) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+def mesh_size(vertex_count, triangle_count):
+    # Estimate of the memory held by a mesh from build_mesh and add_uv_layer: positions, loop vertex indices, loop UVs and polygon loop starts
+    return vertex_count * 12 + triangle_count * 3 * (4 + 8) + triangle_count * 4
+
+def build_armature(context, name, skeleton, bind_matrices, collection):
+    """Create an armature object in collection from bone columns and their (n, 4, 4) bind pose matrices"""
+    armature = bpy.data.armatures.new(name)
+    armature_object = bpy.data.objects.new(name, armature)
+    collection.objects.link(armature_object)
+
+    parents = skeleton.parents.astype(np.int64)
+    parents[parents >= skeleton.count] = -1
+
+    # Bones reach their farthest child, leaves get the typical length of the others
+    heads = bind_matrices[:, :3, 3]
+    has_parent = parents >= 0
+    lengths = np.zeros(skeleton.count)
+    np.maximum.at(lengths, parents[has_parent], np.linalg.norm(heads[has_parent] - heads[parents[has_parent]], axis=1))
+    too_short = lengths < 1e-4
+    lengths[too_short] = np.median(lengths[~too_short]) if not np.all(too_short) else 0.1
+
+    # Edit bones only exist in edit mode, all of them are created in a single edit mode session
+    if context.object != None and context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    previous_active = context.view_layer.objects.active
+    context.view_layer.objects.active = armature_object
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    edit_bones = [armature.edit_bones.new(bone_name) for bone_name in skeleton.names]
+    for edit_bone, matrix, length in zip(edit_bones, bind_matrices, lengths.tolist()):
+        edit_bone.tail = (0, length, 0)
+        edit_bone.matrix = mathutils.Matrix(matrix.tolist())
+    for edit_bone, parent in zip(edit_bones, parents.tolist()):
+        if parent >= 0:
+            edit_bone.parent = edit_bones[parent]
+
+    bpy.ops.object.mode_set(mode='OBJECT')
+    context.view_layer.objects.active = previous_active
+
+    return armature_object
+
+def bind_skin(mesh_object, bone_names, influences, add_weights=True):
+    """Create the vertex groups of the bones in influences, and unless the mesh already has them add their weights"""
+    # Groups are created in bone order so that meshes shared by several objects keep matching group indices,
+    # since Blender 3.0 group names belong to the mesh and shared meshes already have them
+    bones = sorted({bone for bone, _, _ in influences})
+    if len(mesh_object.vertex_groups) == 0:
+        for bone in bones:
+            mesh_object.vertex_groups.new(name=bone_names[bone])
+    vertex_groups = {bone: mesh_object.vertex_groups[i] for i, bone in enumerate(bones)}
+    if add_weights:
+        for bone, weight, vertices in influences:
+            vertex_groups[bone].add(vertices.tolist(), weight, 'REPLACE')
+    return len(vertex_groups)
+
+def build_mesh(name, positions, triangles):
+    """Create a triangle mesh from (n, 3) positions and (m, 3) vertex indices"""
+    loop_vertices = np.ascontiguousarray(triangles, dtype=np.int32).ravel()
+    loop_count = len(loop_vertices)
+    polygon_count = len(triangles)
+
+    mesh = bpy.data.meshes.new(name)
+
+    mesh.vertices.add(len(positions))
+    mesh.vertices.foreach_set('co', np.ascontiguousarray(positions, dtype=np.float32).ravel())
+
+    mesh.loops.add(loop_count)
+    mesh.loops.foreach_set('vertex_index', loop_vertices)
+
+    mesh.polygons.add(polygon_count)
+    mesh.polygons.foreach_set('loop_start', np.arange(0, loop_count, 3, dtype=np.int32))
+    if bpy.app.version < (4, 0, 0): # loop_total is derived from loop_start since 4.0
+        mesh.polygons.foreach_set('loop_total', np.full(polygon_count, 3, dtype=np.int32))
+
+    mesh.update(calc_edges=True)
+
+    return mesh
+
+def add_uv_layer(mesh, triangles, texcoords, name="UVMap"):
+    """Add a UV layer to a mesh from build_mesh, from the (n, 2) UVs of its vertices"""
+    # One UV per loop, gathered from the per-vertex texcoords through the loop vertex indices
+    loop_vertices = np.ascontiguousarray(triangles, dtype=np.int32).ravel()
+    uv_layer = mesh.uv_layers.new(name=name)
+    uv_layer.data.foreach_set('uv', np.ascontiguousarray(texcoords[loop_vertices], dtype=np.float32).ravel())
+    return uv_layer
+
+def add_color_attribute(mesh, triangles, colors):
+    """Add a color attribute to a mesh from build_mesh, from the (n, 4) linear RGBA colors of its vertices"""
+    if hasattr(mesh, 'color_attributes'): # Blender 3.2+
+        attribute = mesh.color_attributes.new("Color", 'FLOAT_COLOR', 'POINT')
+        attribute.data.foreach_set('color', np.ascontiguousarray(colors, dtype=np.float32).ravel())
+        return attribute
+    # Loop colors before, set as sRGB
+    loop_vertices = np.ascontiguousarray(triangles, dtype=np.int32).ravel()
+    srgb = colors.copy()
+    rgb = colors[:, :3]
+    srgb[:, :3] = np.where(rgb <= 0.0031308, rgb * 12.92, 1.055 * np.power(rgb, 1 / 2.4) - 0.055)
+    vertex_colors = mesh.vertex_colors.new(name="Color")
+    vertex_colors.data.foreach_set('color', np.ascontiguousarray(srgb[loop_vertices], dtype=np.float32).ravel())
+    return vertex_colors
+
+def set_custom_normals(mesh, normals):
+    """Set the (n, 3) unit normals of the vertices of a mesh from build_mesh as its custom split normals"""
+    mesh.polygons.foreach_set('use_smooth', np.ones(len(mesh.polygons), dtype=bool))
+    if bpy.app.version < (4, 1, 0): # custom normals are ignored without auto smooth before 4.1
+        mesh.use_auto_smooth = True
+    # RNA function arguments take nested lists about twice as fast as arrays
+    mesh.normals_split_custom_set_from_vertices(normals.tolist())
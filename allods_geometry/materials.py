@@ -0,0 +1,222 @@
+import bpy
+
+import os
+import pathlib
+
+from .asset import model_name
+from .geometry import BlendEffect
+
+## Materials
+
+# Custom property holding the signature of imported materials, so that later imports reuse them
+MATERIAL_PROPERTY = 'allods_material'
+
+# Formats textures are usually extracted to, in order of preference
+TEXTURE_EXTENSIONS = ('.png', '.tga', '.dds', '.bmp', '.jpg', '.jpeg')
+
+ADDITIVE_BLEND_EFFECTS = (BlendEffect.BLEND_EFFECT_ADD, BlendEffect.BLEND_EFFECT_ALPHA_ADD, BlendEffect.BLEND_EFFECT_COLOR_ADD)
+
+class ImageCache:
+
+    # Images by file path, reusing the images already in the blend file. Images are only loaded as data-blocks,
+    # Blender reads their pixels when they are first displayed or rendered. Texture references are resolved
+    # once per geometry directory, and the directories searched are listed once
+    def __init__(self, texture_directory=None):
+        self.texture_directory = pathlib.Path(texture_directory) if texture_directory else None
+        self.hits = 0
+        self.misses = 0
+        self.missing = set()
+        self._images = {ImageCache._key(bpy.path.abspath(image.filepath)): image for image in bpy.data.images if image.source == 'FILE' and image.filepath}
+        self._paths = dict() # (href, geometry directory) -> image file path or None
+        self._listings = dict() # directory -> {lower case file name: file name}
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _listing(self, directory):
+        listing = self._listings.get(directory)
+        if listing == None:
+            try:
+                listing = {name.lower(): name for name in os.listdir(directory)}
+            except OSError:
+                listing = dict()
+            self._listings[directory] = listing
+        return listing
+
+    def find(self, href, xdb_path):
+        """Image file of a texture reference like /Creatures/Goblin/Goblin.(Texture).xdb#xpointer(/Texture), extracted
+        next to the geometry, in the texture directory, or at its place in the client tree holding the geometry"""
+        xdb_directory = pathlib.Path(xdb_path).parent
+        key = (href, xdb_directory)
+        if key in self._paths:
+            return self._paths[key]
+
+        texture_path = href.split('#', 1)[0].strip('/')
+        name = model_name(texture_path)
+        relative_directory = pathlib.PurePosixPath(texture_path).parent.parts
+        directories = [xdb_directory]
+        if self.texture_directory != None:
+            directories += [self.texture_directory, self.texture_directory.joinpath(*relative_directory)]
+        directories += [ancestor.joinpath(*relative_directory) for ancestor in xdb_directory.parents]
+
+        path = None
+        for directory in directories:
+            listing = self._listing(directory)
+            file_name = next((listing[candidate] for candidate in (f"{stem}{extension}".lower() for stem in (name, f"{name}.(Texture)") for extension in TEXTURE_EXTENSIONS)
+                              if candidate in listing), None)
+            if file_name != None:
+                path = directory / file_name
+                break
+        self._paths[key] = path
+        return path
+
+    def get(self, href, xdb_path):
+        """Image of a texture reference, None when no image file is found"""
+        if not href:
+            return None
+        path = self.find(href, xdb_path)
+        if path == None:
+            self.missing.add(href)
+            return None
+        key = ImageCache._key(path)
+        image = self._images.get(key)
+        if image != None:
+            self.hits += 1
+            return image
+        image = bpy.data.images.load(str(path), check_existing=True)
+        self._images[key] = image
+        self.misses += 1
+        return image
+
+class MaterialLibrary:
+
+    # Materials are built once per signature (images, blend effect, flags and UV speeds), shared by every
+    # element and LOD using them, and found again by later imports through their MATERIAL_PROPERTY
+    def __init__(self, images):
+        self.images = images
+        self.hits = 0
+        self.misses = 0
+        self._materials = {material[MATERIAL_PROPERTY]: material for material in bpy.data.materials if MATERIAL_PROPERTY in material}
+
+    def get(self, model_element, xdb_path):
+        """Blender material of a model element, None when it has no material"""
+        material = model_element.material
+        if material == None:
+            return None
+        diffuse_image = self.images.get(material.diffuse_texture, xdb_path)
+        transparency_image = self.images.get(material.transparency_texture, xdb_path)
+        signature = material_signature(material, diffuse_image, transparency_image)
+        blender_material = self._materials.get(signature)
+        if blender_material != None:
+            self.hits += 1
+            return blender_material
+        name = model_element.material_name or (model_name(material.diffuse_texture.split('#', 1)[0]) if material.diffuse_texture else model_element.name)
+        blender_material = build_material(name, material, diffuse_image, transparency_image)
+        blender_material[MATERIAL_PROPERTY] = signature
+        self._materials[signature] = blender_material
+        self.misses += 1
+        return blender_material
+
+def material_signature(material, diffuse_image, transparency_image):
+    # Missing images are identified by their reference, so that materials get rebuilt once they are extracted
+    image_key = lambda image, href: image.filepath if image != None else f"missing:{href or ''}"
+    blend_effect = material.blend_effect.name if material.blend_effect != None else None
+    return repr((image_key(diffuse_image, material.diffuse_texture), image_key(transparency_image, material.transparency_texture), blend_effect,
+                 material.transparent, material.visible, material.scroll_rgb, material.scroll_alpha, material.u_translate_speed, material.v_translate_speed))
+
+def assign_material(mesh_object, material):
+    # Meshes may be shared by elements with different materials, those get an object material instead
+    mesh = mesh_object.data
+    if len(mesh.materials) == 0:
+        mesh.materials.append(material)
+    elif mesh.materials[0] != material:
+        slot = mesh_object.material_slots[0]
+        slot.link = 'OBJECT'
+        slot.material = material
+
+def build_material(name, material, diffuse_image, transparency_image):
+    """Node based material of an Allods material: diffuse color, alpha from the transparency texture (or the diffuse
+    alpha) when transparent, additive blend effects as emission over transparency, and scrolling UVs"""
+    blender_material = bpy.data.materials.new(name)
+    blender_material.use_nodes = True
+    nodes = blender_material.node_tree.nodes
+    links = blender_material.node_tree.links
+    nodes.clear()
+
+    output = nodes.new('ShaderNodeOutputMaterial')
+    output.location = (600, 0)
+
+    if not material.visible:
+        shader = nodes.new('ShaderNodeBsdfTransparent')
+        links.new(shader.outputs['BSDF'], output.inputs['Surface'])
+        set_blend_method(blender_material, 'CLIP')
+        return blender_material
+
+    fps = bpy.context.scene.render.fps / bpy.context.scene.render.fps_base
+    diffuse = add_texture(nodes, links, diffuse_image, material.scroll_rgb, material, fps, (-400, 300))
+    transparency = add_texture(nodes, links, transparency_image, material.scroll_alpha, material, fps, (-400, -100))
+
+    color = diffuse.outputs['Color'] if diffuse != None else None
+    alpha = None
+    if material.transparent:
+        if transparency != None:
+            alpha = transparency.outputs['Color']
+        elif diffuse != None:
+            # Color blend effects use the brightness of the color as opacity
+            alpha = diffuse.outputs['Color'] if material.blend_effect in (BlendEffect.BLEND_EFFECT_COLOR, BlendEffect.BLEND_EFFECT_COLOR_ADD) else diffuse.outputs['Alpha']
+
+    if material.transparent and material.blend_effect in ADDITIVE_BLEND_EFFECTS:
+        emission = nodes.new('ShaderNodeEmission')
+        emission.location = (100, 100)
+        if color != None:
+            links.new(color, emission.inputs['Color'])
+        if alpha != None:
+            links.new(alpha, emission.inputs['Strength'])
+        transparent = nodes.new('ShaderNodeBsdfTransparent')
+        transparent.location = (100, -100)
+        shader = nodes.new('ShaderNodeAddShader')
+        shader.location = (350, 0)
+        links.new(emission.outputs['Emission'], shader.inputs[0])
+        links.new(transparent.outputs['BSDF'], shader.inputs[1])
+        links.new(shader.outputs['Shader'], output.inputs['Surface'])
+        set_blend_method(blender_material, 'BLEND')
+        return blender_material
+
+    shader = nodes.new('ShaderNodeBsdfPrincipled')
+    shader.location = (100, 0)
+    if color != None:
+        links.new(color, shader.inputs['Base Color'])
+    if alpha != None:
+        links.new(alpha, shader.inputs['Alpha'])
+    links.new(shader.outputs['BSDF'], output.inputs['Surface'])
+    set_blend_method(blender_material, 'BLEND' if alpha != None else 'OPAQUE')
+    return blender_material
+
+def add_texture(nodes, links, image, scroll, material, fps, location):
+    # Image texture node, its UVs moving by the translate speeds (in UV units per second) when scroll is set
+    if image == None:
+        return None
+    texture = nodes.new('ShaderNodeTexImage')
+    texture.image = image
+    texture.location = location
+    if scroll and (material.u_translate_speed or material.v_translate_speed):
+        coordinates = nodes.new('ShaderNodeTexCoord')
+        coordinates.location = (location[0] - 400, location[1])
+        mapping = nodes.new('ShaderNodeMapping')
+        mapping.location = (location[0] - 200, location[1])
+        links.new(coordinates.outputs['UV'], mapping.inputs['Vector'])
+        links.new(mapping.outputs['Vector'], texture.inputs['Vector'])
+        for axis, speed in enumerate((material.u_translate_speed, material.v_translate_speed)):
+            if speed:
+                driver = mapping.inputs['Location'].driver_add('default_value', axis).driver
+                driver.expression = f"frame * {speed / fps!r}"
+    return texture
+
+def set_blend_method(blender_material, blend_method):
+    # EEVEE Next (Blender 4.2) replaces blend modes by a render method, alpha clipping is done in the node tree
+    if hasattr(blender_material, 'surface_render_method'):
+        blender_material.surface_render_method = 'BLENDED' if blend_method == 'BLEND' else 'DITHERED'
+    else:
+        blender_material.blend_method = blend_method
+        blender_material.shadow_method = 'HASHED' if blend_method != 'OPAQUE' else 'OPAQUE'
@@ -0,0 +1,477 @@
+import numpy as np
+
+import zlib
+
+from xml.etree import ElementTree
+from struct import pack, unpack, unpack_from
+
+from .geometry import VertexComponent, VertexDeclaration, VertexElementType, VERTEX_ELEMENT_DTYPES, Vertex, VertexColumns, Bone, BoneColumns, Blob, ModelElement, GeometryFragment, Material, BlendEffect
+
+## File parsers
+
+def _parse_bool(text):
+    return text.strip().lower() in ('true', '1', 'yes', 'on')
+
+def _parse_text(text):
+    return text
+
+def _parse_blend_effect(text):
+    return BlendEffect.__members__.get(text)
+
+# Kinds of entries of the extraction plan
+_FIELD, _HREF, _GROUP, _RECORD = range(4)
+
+def _compile_xdb_plan():
+    # Tree of the elements read from a document, keyed by tag: fields are converted from the text of
+    # leaf elements, hrefs are read from attributes, groups are descended into and records collect
+    # the values below them into one of the geometry structures
+    def field(name, convert):
+        return (_FIELD, name, convert)
+
+    vertex_declaration = {'stride': field('stride', int)}
+    for component in VertexBinConverter.COMPONENTS:
+        vertex_declaration[component] = (_GROUP, None, {
+            'type': field(f"{component}_type", VertexElementType.__getitem__),
+            'offset': field(f"{component}_offset", int),
+        })
+
+    blob = {
+        'localID': field('localId', int),
+        'size': field('size', int),
+    }
+
+    lod = {
+        'vertexBufferBegin': field('vertex_buffer_begin', int),
+        'vertexBufferEnd': field('vertex_buffer_end', int),
+        'indexBufferBegin': field('index_buffer_begin', int),
+        'indexBufferEnd': field('index_buffer_end', int),
+    }
+
+    material = {
+        'BlendEffect': field('blend_effect', _parse_blend_effect),
+        'diffuseTexture': (_HREF, 'diffuse_texture', None),
+        'scrollAlpha': field('scroll_alpha', _parse_bool),
+        'scrollRGB': field('scroll_rgb', _parse_bool),
+        'ScrollRGB': field('scroll_rgb', _parse_bool),
+        'transparencyTexture': (_HREF, 'transparency_texture', None),
+        'transparent': field('transparent', _parse_bool),
+        'useFog': field('use_fog', _parse_bool),
+        'uTranslateSpeed': field('u_translate_speed', float),
+        'visible': field('visible', _parse_bool),
+        'vTranslateSpeed': field('v_translate_speed', float),
+    }
+
+    model_element = {
+        'name': field('name', _parse_text),
+        'materialName': field('material_name', _parse_text),
+        'skinIndex': field('skin_index', int),
+        'vertexBufferOffset': field('vertex_buffer_offset', int),
+        'vertexDeclarationID': field('vertex_declaration_id', int),
+        'virtualOffset': field('virtual_offset', float),
+        'lods': (_GROUP, None, {'Item': (_RECORD, 'lod', lod)}),
+        'material': (_RECORD, 'material', material),
+    }
+
+    return {
+        'vertexDeclarations': (_GROUP, None, {'Item': (_RECORD, 'vertex_declaration', vertex_declaration)}),
+        'vertexBuffer': (_RECORD, 'vertex_buffer', blob),
+        'indexBuffer': (_RECORD, 'index_buffer', blob),
+        'skeleton': (_RECORD, 'skeleton', blob),
+        'modelElements': (_GROUP, None, {'Item': (_RECORD, 'model_element', model_element)}),
+        'binaryFile': (_HREF, 'binary_file', None),
+        'vb32': field('vb32', _parse_bool),
+    }
+
+class XdbParser:
+
+    _plan = None
+
+    # Every value is extracted in a single walk over the document driven by the plan, which skips
+    # unused sections and avoids a path lookup per value, the document is dropped afterwards
+    def __init__(self, path):
+        self.path = path
+        self._vertex_declarations = []
+        self._index_buffer = None
+        self._vertex_buffer = None
+        self._model_elements = []
+        self._skeleton = None
+        self._binary_file = None
+        self._vb32 = None
+        if XdbParser._plan == None:
+            XdbParser._plan = _compile_xdb_plan()
+        values = dict()
+        self._walk(ElementTree.parse(path).getroot(), XdbParser._plan, values)
+        self._binary_file = values.get('binary_file')
+        self._vb32 = values.get('vb32')
+
+    def _walk(self, element, plan, values):
+        for child in element:
+            entry = plan.get(child.tag)
+            if entry == None:
+                continue
+            kind, name, argument = entry
+            if kind == _FIELD:
+                values[name] = argument(child.text)
+            elif kind == _HREF:
+                values[name] = child.get('href')
+            elif kind == _GROUP:
+                self._walk(child, argument, values)
+            else:
+                record_values = dict()
+                self._walk(child, argument, record_values)
+                self._finish_record(name, record_values, values)
+
+    def _finish_record(self, kind, values, parent):
+        try:
+            if kind == 'vertex_declaration':
+                components = [VertexComponent(values[f"{component}_type"], values[f"{component}_offset"]) for component in VertexBinConverter.COMPONENTS]
+                self._vertex_declarations.append(VertexDeclaration(*components, values['stride']))
+            elif kind == 'vertex_buffer':
+                self._vertex_buffer = Blob(values['localId'], values['size'])
+            elif kind == 'index_buffer':
+                self._index_buffer = Blob(values['localId'], values['size'])
+            elif kind == 'skeleton':
+                self._skeleton = Blob(values['localId'], values['size'])
+            elif kind == 'lod':
+                parent.setdefault('lods', []).append(GeometryFragment(values['vertex_buffer_begin'], values['vertex_buffer_end'], values['index_buffer_begin'], values['index_buffer_end']))
+            elif kind == 'material':
+                parent['material'] = Material(values.get('blend_effect'), values.get('diffuse_texture'), values.get('scroll_alpha', False), values.get('scroll_rgb', False),
+                    values.get('transparency_texture'), values.get('transparent', False), values.get('use_fog', False), values.get('u_translate_speed', 0.0),
+                    values.get('visible', True), values.get('v_translate_speed', 0.0))
+            elif kind == 'model_element':
+                self._model_elements.append(ModelElement(values.get('lods', []), values['name'], values['material_name'], values['vertex_declaration_id'],
+                    values['vertex_buffer_offset'], values.get('material'), values['skin_index'], values['virtual_offset']))
+        except KeyError as e:
+            raise Exception('Missing {} in {} of {}'.format(e.args[0], kind, self.path)) from e
+
+    def get_vertex_declarations(self):
+        return self._vertex_declarations
+
+    def get_index_buffer(self):
+        return self._index_buffer
+
+    def get_vertex_buffer(self):
+        return self._vertex_buffer
+
+    def get_skeleton(self):
+        return self._skeleton
+
+    def get_model_elements(self):
+        return self._model_elements
+
+    def get_index_count(self):
+        return max((lod.index_buffer_end for model_element in self.get_model_elements() for lod in model_element.lods), default=0)
+
+    def get_binary_file(self):
+        return self._binary_file
+
+    def get_vb32(self):
+        # 32-bit index buffer, None when the document has no vb32 element
+        return self._vb32
+
+class BinParser:
+
+    CHUNK_SIZE = 1 << 16
+
+    # In lazy mode the archive is only inflated up to the last requested blob, and the file stays open until
+    # the end of the archive is reached or close() is called, which a with block does
+    def __init__(self, path, lazy=False):
+        self.path = path
+        self.offsets = [] # (localId, offset, size) of each blob in the inflated stream
+        self._blobs = []
+        self._file = open(self.path, 'rb')
+        self._decompressor = zlib.decompressobj()
+        self._position = 0
+        if not lazy:
+            self._read_blobs()
+
+    def _read_blobs(self, count=None):
+        success = False
+        try:
+            while self._file != None and (count == None or len(self._blobs) < count):
+                header, header_size = self._inflate(8)
+                if header_size == 0 and self._decompressor.eof:
+                    self.close()
+                    break
+                if header_size < 8:
+                    raise Exception('Truncated archive {}: incomplete header of blob {} at offset {}'.format(self.path, len(self._blobs), self._position))
+                localId, size = unpack('II', header)
+                if localId != len(self._blobs):
+                    raise Exception('Corrupt archive {}: expected blob {} at offset {}, found {}'.format(self.path, len(self._blobs), self._position, localId))
+                value, value_size = self._inflate(size)
+                if value_size < size:
+                    raise Exception('Truncated archive {}: blob {} has {} of {} bytes'.format(self.path, localId, value_size, size))
+                self.offsets.append((localId, self._position + 8, size))
+                self._blobs.append(value)
+                self._position += 8 + size
+            success = True
+        finally:
+            # Nothing more can be read from a truncated or corrupt stream
+            if not success:
+                self.close()
+
+    def _inflate(self, size):
+        # Inflates exactly size bytes into a new buffer, unless the stream ends first
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < size and not self._decompressor.eof:
+            data = self._decompressor.unconsumed_tail or self._file.read(BinParser.CHUNK_SIZE)
+            if not data:
+                break
+            try:
+                chunk = self._decompressor.decompress(data, size - filled)
+            except zlib.error as e:
+                raise Exception('Corrupt archive {}: {}'.format(self.path, e)) from e
+            view[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+        if filled < size and not self._decompressor.eof and not self._decompressor.unconsumed_tail:
+            raise Exception('Truncated archive {}: compressed stream ends at offset {}'.format(self.path, self._position + filled))
+        return buffer, filled
+
+    def close(self):
+        if self._file != None:
+            self._file.close()
+            self._file = None
+            self._decompressor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def iter_blobs(self):
+        """Yield (localId, buffer) of every blob from the first one, each as soon as it is inflated"""
+        localId = 0
+        while True:
+            if localId >= len(self._blobs):
+                self._read_blobs(localId + 1)
+            if localId >= len(self._blobs):
+                return
+            yield localId, memoryview(self._blobs[localId])
+            localId += 1
+
+    def get_buffer(self, blob):
+        if blob.localId >= len(self._blobs):
+            self._read_blobs(blob.localId + 1)
+        if blob.localId >= len(self._blobs):
+            raise Exception('Missing blob {} in archive {}'.format(blob.localId, self.path))
+        assert(len(self._blobs[blob.localId]) == blob.size)
+        return memoryview(self._blobs[blob.localId])
+
+class BoneBinParser:
+
+    # Inverted world matrix (4 rows of 3 floats) followed by the parent index
+    BONE_LIST_DTYPE = np.dtype([('matrix', '<f4', (4, 3)), ('parent', '<u4')])
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.bones = None
+        self.columns = None
+
+    def get_bone_columns(self):
+        if self.columns == None:
+            bone_list_offset, bone_list_size, bone_names_offset, bone_names_size, bone_ids_offset, bone_ids_size, bone_local_offset, bone_local_size = unpack_from('IIIIIIII', self.buffer)
+
+            assert bone_list_size == bone_names_size == bone_ids_size == bone_local_size
+            count = bone_list_size
+
+            bone_names_offset += 8
+            bone_ids_offset += 16
+            bone_local_offset += 24
+
+            bone_list = np.frombuffer(self.buffer, dtype=BoneBinParser.BONE_LIST_DTYPE, count=count, offset=bone_list_offset)
+            inverted_world_matrices = BoneBinParser._expand_matrices(bone_list['matrix'])
+            local_matrices = BoneBinParser._expand_matrices(np.frombuffer(self.buffer, dtype='<f4', count=count * 12, offset=bone_local_offset).reshape(-1, 4, 3))
+            ids = np.frombuffer(self.buffer, dtype='<u2', count=count, offset=bone_ids_offset)
+
+            # Name offsets are relative to their own (offset, length) entry
+            names = []
+            name_entries = np.frombuffer(self.buffer, dtype='<u4', count=count * 2, offset=bone_names_offset).reshape(-1, 2)
+            for i, (offset, length) in enumerate(name_entries.tolist()):
+                start = bone_names_offset + i*8 + offset
+                names.append(bytes(self.buffer[start:start + length]).decode('utf-8').rstrip('\x00'))
+
+            self.columns = BoneColumns(count, names, bone_list['parent'], ids, inverted_world_matrices, local_matrices)
+        return self.columns
+
+    def get_bones(self):
+        if self.bones == None:
+            columns = self.get_bone_columns()
+            self.bones = []
+            for i in range(columns.count):
+                self.bones.append(Bone(columns.inverted_world_matrices[i], int(columns.parents[i]), int(columns.ids[i]), columns.names[i], columns.local_matrices[i]))
+        return self.bones
+
+    @staticmethod
+    def _expand_matrices(matrices):
+        # (n, 4, 3) affine matrices to (n, 4, 4), translation stays in the last row
+        expanded = np.zeros((len(matrices), 4, 4), dtype=np.float32)
+        expanded[:, :, :3] = matrices
+        expanded[:, 3, 3] = 1
+        return expanded
+
+class IndexBinConverter:
+
+    # The index width is given by the vb32 flag of the .xdb file, see XdbParser.get_vb32. Without the flag
+    # it is told by the size of the buffer, which must hold the indices the LODs use in only one of the widths
+    def __init__(self, index_count, vb32=None):
+        self.index_count = index_count
+        self.vb32 = vb32
+
+    def bin_to_indices(self, buffer):
+        # Viewed without copy, the size is only checked against the indices the LODs use
+        vb32 = self.vb32
+        if vb32 == None:
+            if self.index_count > 0 and len(buffer) == self.index_count * 4:
+                vb32 = True
+            elif self.index_count * 2 <= len(buffer) < self.index_count * 4:
+                vb32 = False
+            else:
+                raise Exception('Index buffer of {} bytes has no vb32 flag, and its size does not tell the width of {} indices'.format(len(buffer), self.index_count))
+        dtype = np.dtype('<u4' if vb32 else '<u2')
+        if len(buffer) < self.index_count * dtype.itemsize or len(buffer) % dtype.itemsize != 0:
+            raise Exception('Index buffer of {} bytes does not hold {} {}-bit indices'.format(len(buffer), self.index_count, dtype.itemsize * 8))
+        return np.frombuffer(buffer, dtype=dtype)
+
+    @staticmethod
+    def is_vb32(indices):
+        # 16-bit unless decoded from a 32-bit buffer or addressing more vertices
+        indices = np.asarray(indices)
+        return indices.dtype.itemsize > 2 and (indices.dtype == np.uint32 or (len(indices) > 0 and indices.max() > 0xFFFF))
+
+    @staticmethod
+    def indices_to_bin(indices):
+        dtype = '<u4' if IndexBinConverter.is_vb32(indices) else '<u2'
+        return np.ascontiguousarray(indices, dtype=dtype).tobytes()
+
+class VertexBinConverter:
+
+    COMPONENTS = ('position', 'normal', 'color', 'texcoord0', 'texcoord1', 'weights', 'indices')
+
+    def __init__(self, vertex_declaration):
+        self.vertex_declaration = vertex_declaration
+        self.dtype = VertexBinConverter._build_dtype(vertex_declaration)
+
+    def vertex_to_bin(self, vertex):
+        buffer = [0] * self.vertex_declaration.stride
+        VertexBinConverter._write_vertex_component(self.vertex_declaration.position, buffer, vertex.position)
+        VertexBinConverter._write_vertex_component(self.vertex_declaration.normal, buffer, vertex.normal)
+        VertexBinConverter._write_vertex_component(self.vertex_declaration.color, buffer, vertex.color)
+        VertexBinConverter._write_vertex_component(self.vertex_declaration.texcoord0, buffer, vertex.texcoord0)
+        VertexBinConverter._write_vertex_component(self.vertex_declaration.texcoord1, buffer, vertex.texcoord1)
+        VertexBinConverter._write_vertex_component(self.vertex_declaration.weights, buffer, vertex.weights)
+        VertexBinConverter._write_vertex_component(self.vertex_declaration.indices, buffer, vertex.indices)
+        return buffer
+
+    def bin_to_vertex(self, buffer):
+        assert len(buffer) == self.vertex_declaration.stride
+        return Vertex(
+            VertexBinConverter._read_vertex_component(self.vertex_declaration.position, buffer),
+            VertexBinConverter._read_vertex_component(self.vertex_declaration.normal, buffer),
+            VertexBinConverter._read_vertex_component(self.vertex_declaration.color, buffer),
+            VertexBinConverter._read_vertex_component(self.vertex_declaration.texcoord0, buffer),
+            VertexBinConverter._read_vertex_component(self.vertex_declaration.texcoord1, buffer),
+            VertexBinConverter._read_vertex_component(self.vertex_declaration.weights, buffer),
+            VertexBinConverter._read_vertex_component(self.vertex_declaration.indices, buffer)
+        )
+    
+    def bin_to_vertices(self, buffer):
+        assert len(buffer) % self.vertex_declaration.stride == 0
+        count = len(buffer) // self.vertex_declaration.stride
+        vertices = []
+        for i in range(count):
+            offset = i * self.vertex_declaration.stride
+            vertices.append(self.bin_to_vertex(buffer[offset:offset + self.vertex_declaration.stride]))
+        return vertices
+
+    def columns_to_bin(self, columns):
+        # Inverse of bin_to_columns: every component is packed into the stride layout in one assignment
+        records = np.zeros(columns.count, dtype=self.dtype)
+        for name in self.dtype.names:
+            column = getattr(columns, name)
+            if column is None:
+                raise Exception('Vertex declaration has {} but the vertices have none'.format(name))
+            records[name] = column
+        return records.tobytes()
+
+    def bin_to_columns(self, buffer):
+        # Whole buffer is viewed as one structured array, each component is a strided view into it (no copy)
+        assert len(buffer) % self.vertex_declaration.stride == 0
+        records = np.frombuffer(buffer, dtype=self.dtype)
+        columns = [records[name] if name in self.dtype.names else None for name in VertexBinConverter.COMPONENTS]
+        return VertexColumns(len(records), *columns)
+
+    @staticmethod
+    def _build_dtype(vertex_declaration):
+        names, formats, offsets = [], [], []
+        for name in VertexBinConverter.COMPONENTS:
+            vertex_component = getattr(vertex_declaration, name)
+            if vertex_component.type not in VERTEX_ELEMENT_DTYPES:
+                raise Exception('Unknown value type: {}'.format(vertex_component.type))
+            element_dtype = VERTEX_ELEMENT_DTYPES[vertex_component.type]
+            if element_dtype == None:
+                continue
+            names.append(name)
+            formats.append((element_dtype[0], (element_dtype[1],)))
+            offsets.append(vertex_component.offset)
+        return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': vertex_declaration.stride})
+        
+    @staticmethod
+    def _read_vertex_component(vertex_component, buffer):
+        if vertex_component.type == VertexElementType.FLOAT1:
+            return unpack('f', buffer[vertex_component.offset:vertex_component.offset+4])[0]
+        elif vertex_component.type == VertexElementType.FLOAT2:
+            return unpack('ff', buffer[vertex_component.offset:vertex_component.offset+8])
+        elif vertex_component.type == VertexElementType.FLOAT3:
+            return unpack('fff', buffer[vertex_component.offset:vertex_component.offset+12])
+        elif vertex_component.type == VertexElementType.FLOAT4:
+            return unpack('ffff', buffer[vertex_component.offset:vertex_component.offset+16])
+        elif vertex_component.type == VertexElementType.SHORT2:
+            return unpack('hh', buffer[vertex_component.offset:vertex_component.offset+4])
+        elif vertex_component.type == VertexElementType.SHORT4:
+            return unpack('hhhh', buffer[vertex_component.offset:vertex_component.offset+8])
+        elif vertex_component.type == VertexElementType.COLOR4:
+            return unpack('BBBB', buffer[vertex_component.offset:vertex_component.offset+4])
+        elif vertex_component.type == VertexElementType.UBYTE4:    
+            return unpack('BBBB', buffer[vertex_component.offset:vertex_component.offset+4])
+        elif vertex_component.type == VertexElementType.USHORT2:    
+            return unpack('HH', buffer[vertex_component.offset:vertex_component.offset+4])
+        elif vertex_component.type == VertexElementType.USHORT4:
+            return unpack('HHHH', buffer[vertex_component.offset:vertex_component.offset+8])     
+        elif vertex_component.type == VertexElementType.HALF4:
+            return unpack('eeee', buffer[vertex_component.offset:vertex_component.offset+8])
+        elif vertex_component.type == VertexElementType.UNUSED:
+            return None
+        else:
+            raise Exception('Unknown value type: {}'.format(vertex_component.type))
+
+    @staticmethod
+    def _write_vertex_component(vertex_component, buffer, value):
+        if vertex_component.type == VertexElementType.FLOAT1:
+            buffer[vertex_component.offset:vertex_component.offset+4] = pack('f', value)
+        elif vertex_component.type == VertexElementType.FLOAT2:
+            buffer[vertex_component.offset:vertex_component.offset+8] = pack('ff', *value)
+        elif vertex_component.type == VertexElementType.FLOAT3:
+            buffer[vertex_component.offset:vertex_component.offset+12] = pack('fff', *value)
+        elif vertex_component.type == VertexElementType.FLOAT4:
+            buffer[vertex_component.offset:vertex_component.offset+16] = pack('ffff', *value)
+        elif vertex_component.type == VertexElementType.SHORT2:
+            buffer[vertex_component.offset:vertex_component.offset+4] = pack('hh', *value)
+        elif vertex_component.type == VertexElementType.SHORT4:
+            buffer[vertex_component.offset:vertex_component.offset+8] = pack('hhhh', *value)
+        elif vertex_component.type == VertexElementType.COLOR4:
+            buffer[vertex_component.offset:vertex_component.offset+4] = pack('BBBB', *value)
+        elif vertex_component.type == VertexElementType.UBYTE4:    
+            buffer[vertex_component.offset:vertex_component.offset+4] = pack('BBBB', *value)
+        elif vertex_component.type == VertexElementType.USHORT2:    
+            buffer[vertex_component.offset:vertex_component.offset+4] = pack('HH', *value)
+        elif vertex_component.type == VertexElementType.USHORT4:
+            buffer[vertex_component.offset:vertex_component.offset+8] = pack('HHHH', *value)     
+        elif vertex_component.type == VertexElementType.HALF4:
+            buffer[vertex_component.offset:vertex_component.offset+8] = pack('eeee', *value)
+        elif vertex_component.type == VertexElementType.UNUSED:
+            pass
+        else:
+            raise Exception('Unknown value type: {}'.format(vertex_component.type))
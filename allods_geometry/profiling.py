@@ -0,0 +1,94 @@
+import contextlib
+import json
+import threading
+import time
+import tracemalloc
+
+## Import profiling
+
+class Profiler:
+
+    # Named spans accumulate their duration and call count, counters accumulate values. With trace
+    # enabled every span is also kept as an event of the Chrome trace format (chrome://tracing, Perfetto),
+    # with track_memory the peak of the memory traced by tracemalloc is recorded between start and stop
+    def __init__(self, trace=False, track_memory=False):
+        self.trace = trace
+        self.track_memory = track_memory
+        self.totals = dict()
+        self.calls = dict()
+        self.counters = dict()
+        self.events = []
+        self.peak_memory = None
+        self._origin = time.perf_counter()
+        self._started_tracemalloc = False
+
+    def start(self):
+        self._origin = time.perf_counter()
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            elif hasattr(tracemalloc, 'reset_peak'): # Python 3.9+, otherwise the peak of an outer tracing session
+                tracemalloc.reset_peak()
+
+    def stop(self):
+        self.totals['total'] = time.perf_counter() - self._origin
+        if self.track_memory and tracemalloc.is_tracing():
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.totals[name] = self.totals.get(name, 0) + end - start
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.trace:
+                self.events.append({'name': name, 'ph': 'X', 'ts': (start - self._origin) * 1e6, 'dur': (end - start) * 1e6,
+                                    'pid': 0, 'tid': threading.get_ident(), 'args': args})
+
+    def fork(self):
+        """Profiler for another thread sharing this time origin, to merge back once its work is done"""
+        profiler = Profiler(trace=self.trace)
+        profiler._origin = self._origin
+        return profiler
+
+    def merge(self, other):
+        # Span totals of several threads add up, and may exceed the wall time
+        for name, seconds in other.totals.items():
+            self.totals[name] = self.totals.get(name, 0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + other.calls[name]
+        for name, value in other.counters.items():
+            self.count(name, value)
+        self.events.extend(other.events)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        """One line of the span totals by decreasing duration, the counters and the peak memory"""
+        spans = sorted(((seconds, name) for name, seconds in self.totals.items() if name != 'total'), reverse=True)
+        parts = [f"{name} {seconds * 1000:.1f} ms" + (f" ({self.calls[name]}x)" if self.calls[name] > 1 else "") for seconds, name in spans]
+        parts += [f"{value} {name}" for name, value in self.counters.items()]
+        if self.peak_memory != None:
+            parts.append(f"peak memory {self.peak_memory / 1e6:.1f} MB")
+        total = self.totals.get('total')
+        return (f"{total * 1000:.1f} ms: " if total != None else "") + ", ".join(parts)
+
+    def to_json(self):
+        return {
+            'traceEvents': self.events,
+            'totals': self.totals,
+            'calls': self.calls,
+            'counters': self.counters,
+            'peak_memory': self.peak_memory,
+        }
+
+    def write_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=1)
@@ -0,0 +1,216 @@
+import numpy as np
+
+import zlib
+
+from struct import pack
+from xml.etree import ElementTree
+
+from .geometry import VertexComponent, VertexDeclaration, VertexElementType, VERTEX_ELEMENT_DTYPES, Blob
+from .parsers import BoneBinParser, VertexBinConverter
+
+## File writers
+
+class BinWriter:
+
+    # Blobs are framed by their (localId, size) header and compressed into a single zlib stream as they are added
+    def __init__(self, path, level=zlib.Z_DEFAULT_COMPRESSION):
+        self.path = path
+        self.blobs = []
+        self._file = open(self.path, 'wb')
+        self._compressor = zlib.compressobj(level)
+
+    def add_blob(self, data):
+        blob = Blob(len(self.blobs), len(data))
+        self._file.write(self._compressor.compress(pack('II', blob.localId, blob.size)))
+        self._file.write(self._compressor.compress(data))
+        self.blobs.append(blob)
+        return blob
+
+    def close(self):
+        if self._file != None:
+            self._file.write(self._compressor.flush())
+            self._file.close()
+            self._file = None
+            self._compressor = None
+
+class BoneBinWriter:
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def to_bin(self):
+        # Same layout as the client files: header of (offset, count) pairs with offsets relative to their own
+        # field, bone list, name entries, local matrices, names (null terminated, 4 byte aligned) and ids
+        columns = self.columns
+        count = columns.count
+
+        bone_list = np.zeros(count, dtype=BoneBinParser.BONE_LIST_DTYPE)
+        bone_list['matrix'] = np.asarray(columns.inverted_world_matrices)[:, :, :3]
+        bone_list['parent'] = columns.parents
+        local_matrices = np.ascontiguousarray(np.asarray(columns.local_matrices)[:, :, :3], dtype='<f4')
+
+        names = [name.encode('utf-8') + b'\x00' for name in columns.names]
+        padded_names = [name.ljust((len(name) + 3) & ~3, b'\x00') for name in names]
+
+        bone_list_offset = 32
+        names_offset = bone_list_offset + bone_list.nbytes
+        local_offset = names_offset + 8 * count
+        strings_offset = local_offset + local_matrices.nbytes
+        ids_offset = strings_offset + sum(len(name) for name in padded_names)
+
+        # Name offsets are relative to their own (offset, length) entry, lengths count the terminating null
+        name_entries = np.zeros((count, 2), dtype='<u4')
+        string_offsets = np.cumsum([0] + [len(name) for name in padded_names])[:count]
+        name_entries[:, 0] = strings_offset + string_offsets - (names_offset + 8 * np.arange(count))
+        name_entries[:, 1] = [len(name) for name in names]
+
+        header = pack('IIIIIIII', bone_list_offset, count, names_offset - 8, count, ids_offset - 16, count, local_offset - 24, count)
+        return b''.join((header, bone_list.tobytes(), name_entries.tobytes(), local_matrices.tobytes(), b''.join(padded_names),
+                         np.ascontiguousarray(columns.ids, dtype='<u2').tobytes()))
+
+def vertex_declaration_for(columns):
+    """Vertex declaration packing the components of columns one after the other, from their dtypes"""
+    element_types = {dtype: element_type for element_type, dtype in VERTEX_ELEMENT_DTYPES.items() if dtype != None and element_type != VertexElementType.UBYTE4}
+    components = dict()
+    stride = 0
+    for name in ('position', 'texcoord0', 'texcoord1', 'normal', 'color', 'weights', 'indices'):
+        column = getattr(columns, name)
+        if column is None:
+            components[name] = VertexComponent(VertexElementType.UNUSED, 255)
+            continue
+        dtype = (column.dtype.str.replace('|', ''), column.shape[1] if column.ndim > 1 else 1)
+        if dtype not in element_types:
+            raise Exception('No vertex element type for {} {}'.format(name, column.dtype))
+        # Bone indices are the only unsigned bytes that are not normalized
+        element_type = VertexElementType.UBYTE4 if name == 'indices' and element_types[dtype] == VertexElementType.COLOR4 else element_types[dtype]
+        components[name] = VertexComponent(element_type, stride)
+        stride += column.dtype.itemsize * dtype[1]
+    return VertexDeclaration(*(components[name] for name in VertexBinConverter.COMPONENTS), stride)
+
+class XdbWriter:
+
+    # Elements read by XdbParser are written over a template document, or a new one, keeping everything else.
+    # Children of the written elements are sorted by decreasing tag like in the client files
+    def __init__(self, template=None):
+        self.root = ElementTree.parse(template).getroot() if template != None else ElementTree.Element('Geometry')
+
+    @staticmethod
+    def _child(parent, tag):
+        element = parent.find(tag)
+        if element == None:
+            element = ElementTree.SubElement(parent, tag)
+        return element
+
+    @staticmethod
+    def _set_fields(element, fields):
+        for tag, value in fields.items():
+            XdbWriter._child(element, tag).text = XdbWriter._format(value)
+
+    @staticmethod
+    def _set_href(element, tag, href):
+        child = XdbWriter._child(element, tag)
+        child.attrib = {'href': href if href != None else ""}
+
+    @staticmethod
+    def _format(value):
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, float):
+            # Shortest text parsing back to the same value
+            return repr(value)
+        return str(value)
+
+    @staticmethod
+    def _sort(element):
+        element[:] = sorted(element, key=lambda child: child.tag, reverse=True)
+
+    def set_vertex_declarations(self, vertex_declarations):
+        declarations = self._child(self.root, 'vertexDeclarations')
+        declarations[:] = []
+        for vertex_declaration in vertex_declarations:
+            item = ElementTree.SubElement(declarations, 'Item')
+            for name in VertexBinConverter.COMPONENTS:
+                vertex_component = getattr(vertex_declaration, name)
+                self._set_fields(ElementTree.SubElement(item, name), {'type': vertex_component.type.name, 'offset': vertex_component.offset})
+            self._set_fields(item, {'stride': vertex_declaration.stride})
+            self._sort(item)
+
+    def set_blob(self, tag, blob):
+        self._set_fields(self._child(self.root, tag), {'size': blob.size, 'localID': blob.localId})
+
+    def set_model_elements(self, model_elements):
+        # Items of the template are updated in place, so their fields unknown to ModelElement are kept
+        elements = self._child(self.root, 'modelElements')
+        items = elements.findall('Item')
+        for item in items[len(model_elements):]:
+            elements.remove(item)
+        for i, model_element in enumerate(model_elements):
+            item = items[i] if i < len(items) else ElementTree.SubElement(elements, 'Item')
+            self._set_fields(item, {
+                'virtualOffset': model_element.virtual_offset,
+                'vertexDeclarationID': model_element.vertex_declaration_id,
+                'vertexBufferOffset': model_element.vertex_buffer_offset,
+                'skinIndex': model_element.skin_index,
+                'name': model_element.name,
+                'materialName': model_element.material_name,
+            })
+            if model_element.material != None:
+                self._set_material(self._child(item, 'material'), model_element.material)
+            lods = self._child(item, 'lods')
+            lods[:] = []
+            for lod in model_element.lods:
+                self._set_fields(ElementTree.SubElement(lods, 'Item'), {
+                    'vertexBufferEnd': lod.vertex_buffer_end,
+                    'vertexBufferBegin': lod.vertex_buffer_begin,
+                    'indexBufferEnd': lod.index_buffer_end,
+                    'indexBufferBegin': lod.index_buffer_begin,
+                })
+            self._sort(item)
+
+    def _set_material(self, element, material):
+        # Both spellings of scrollRGB are found in the game files, the one of the template is kept
+        scroll_rgb_tag = 'ScrollRGB' if element.find('ScrollRGB') != None and element.find('scrollRGB') == None else 'scrollRGB'
+        self._set_fields(element, {
+            'visible': material.visible,
+            'vTranslateSpeed': material.v_translate_speed,
+            'useFog': material.use_fog,
+            'uTranslateSpeed': material.u_translate_speed,
+            'transparent': material.transparent,
+            scroll_rgb_tag: material.scroll_rgb,
+            'scrollAlpha': material.scroll_alpha,
+        })
+        if material.blend_effect != None:
+            self._set_fields(element, {'BlendEffect': material.blend_effect.name})
+        self._set_href(element, 'diffuseTexture', material.diffuse_texture)
+        self._set_href(element, 'transparencyTexture', material.transparency_texture)
+        self._sort(element)
+
+    def set_vb32(self, vb32):
+        self._set_fields(self.root, {'vb32': vb32})
+
+    def set_binary_file(self, href):
+        self._set_href(self.root, 'binaryFile', href)
+
+    def get_binary_file(self):
+        element = self.root.find('binaryFile')
+        return element.get('href') if element != None else None
+
+    def write(self, path):
+        self._sort(self.root)
+        XdbWriter._indent(self.root)
+        with open(path, 'wb') as f:
+            f.write(b'<?xml version="1.0" encoding="utf-8"?>\n')
+            ElementTree.ElementTree(self.root).write(f, encoding='utf-8', xml_declaration=False)
+
+    @staticmethod
+    def _indent(element, level=0):
+        # Four spaces per level, ElementTree.indent only exists since Python 3.9
+        children = list(element)
+        if children:
+            element.text = '\n' + '    ' * (level + 1)
+            for child in children:
+                XdbWriter._indent(child, level + 1)
+                child.tail = '\n' + '    ' * (level + 1)
+            children[-1].tail = '\n' + '    ' * level
+        elif element.text != None and not element.text.strip():
+            element.text = None
@@ -0,0 +1,77 @@
+# Times the import operator on each sample model and checks the mesh of every imported object
+# against the from_pydata + per-loop UV construction of the former importer, from the decoded asset.
+#
+# Usage: blender --background --python benchmarks/blender_import.py
+
+import pathlib
+import sys
+import time
+
+import bpy
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import allods_geometry
+
+from allods_geometry import load_asset
+from allods_geometry.importer import ELEMENT_PROPERTY, LOD_PROPERTY
+
+def reference_mesh(asset, model_element, lod_level):
+    # Former importer: from_pydata on the decoded vertices and indices of the LOD, then one UV per loop
+    lod = model_element.lods[lod_level]
+    lod_vertices = range(lod.vertex_buffer_begin + model_element.vertex_buffer_offset, lod.vertex_buffer_end + model_element.vertex_buffer_offset)
+    positions = [asset.vertices.position[k, :3].tolist() for k in lod_vertices]
+    texcoords = [asset.vertices.texcoord0[k, :2].tolist() for k in lod_vertices]
+    lod_indices = [int(asset.indices[k]) - lod.vertex_buffer_begin for k in range(lod.index_buffer_begin, lod.index_buffer_end)]
+
+    reference = bpy.data.meshes.new(model_element.name + '_reference')
+    reference.from_pydata(positions, [], list(zip(lod_indices[0::3], lod_indices[1::3], lod_indices[2::3])))
+    reference.update()
+    uv_layer = reference.uv_layers.new()
+    for face in reference.polygons:
+        for vert_idx, loop_idx in zip(face.vertices, face.loop_indices):
+            uv_layer.data[loop_idx].uv = texcoords[vert_idx]
+    return reference
+
+def mesh_arrays(mesh):
+    arrays = []
+    for collection, attribute, size in ((mesh.vertices, 'co', 3), (mesh.edges, 'vertices', 2), (mesh.loops, 'vertex_index', 1),
+                                        (mesh.polygons, 'loop_start', 1), (mesh.uv_layers[0].data, 'uv', 2)):
+        values = np.empty(len(collection) * size, dtype=np.float32 if attribute in ('co', 'uv') else np.int32)
+        collection.foreach_get(attribute, values)
+        arrays.append(values)
+    return arrays
+
+def main():
+    allods_geometry.register()
+    failures = 0
+    for path in sorted(ROOT.glob('samples/*/*.xdb')):
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+
+        start = time.perf_counter()
+        bpy.ops.allods.import_geometry(filepath=str(path), import_lods=True)
+        elapsed = time.perf_counter() - start
+
+        # Every imported object is compared with a mesh built from the decoded asset the former way
+        meshes = [mesh for mesh in bpy.data.meshes]
+        asset = load_asset(path)
+        mesh_objects = [mesh_object for mesh_object in bpy.data.objects if ELEMENT_PROPERTY in mesh_object]
+        for mesh_object in mesh_objects:
+            reference = reference_mesh(asset, asset.model_elements[mesh_object[ELEMENT_PROPERTY]], mesh_object[LOD_PROPERTY])
+            if not all(np.array_equal(a, b) for a, b in zip(mesh_arrays(mesh_object.data), mesh_arrays(reference))):
+                print(f"  object {mesh_object.name} differs from the from_pydata reference")
+                failures += 1
+            bpy.data.meshes.remove(reference)
+        if not mesh_objects:
+            print(f"  no object imported from {path.name}")
+            failures += 1
+
+        print(f"{path.name}: {len(meshes)} meshes, {len(bpy.data.objects)} objects, "
+              f"{len(bpy.data.collections)} collections, import {elapsed * 1000:.1f} ms")
+    allods_geometry.unregister()
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# Re-encodes the sample assets and checks that the vertex, index and skeleton blobs are byte-identical
+# to the original ones, directly and through save_asset, and times columnar against per-vertex encoding.
+#
+# Usage: python benchmarks/export_roundtrip.py
+
+import pathlib
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from allods_geometry import XdbParser, BinParser, BoneBinParser, IndexBinConverter, VertexBinConverter, BoneBinWriter, load_asset, lod_ranges, save_asset
+
+REPEAT = 5
+
+def blobs(path):
+    parser = XdbParser(path)
+    bin_parser = BinParser(path.with_suffix('.bin'))
+    return parser, [bytes(bin_parser.get_buffer(blob)) for blob in (parser.get_vertex_buffer(), parser.get_index_buffer(), parser.get_skeleton())]
+
+def main():
+    failures = 0
+    for path in sorted(ROOT.glob('samples/*/*.xdb')):
+        parser, (vertex_blob, index_blob, skeleton_blob) = blobs(path)
+        converter = VertexBinConverter(parser.get_vertex_declarations()[0])
+        columns = converter.bin_to_columns(vertex_blob)
+        indices = IndexBinConverter(parser.get_index_count(), parser.get_vb32()).bin_to_indices(index_blob)
+        skeleton = BoneBinParser(skeleton_blob).get_bone_columns()
+
+        checks = {
+            'vertices': converter.columns_to_bin(columns) == vertex_blob,
+            'indices': IndexBinConverter.indices_to_bin(indices) == index_blob,
+            'skeleton': BoneBinWriter(skeleton).to_bin() == skeleton_blob,
+        }
+
+        # Whole asset written over the original .xdb, then without template and the default vertex declaration
+        asset = load_asset(path)
+        with tempfile.TemporaryDirectory() as directory:
+            output = pathlib.Path(directory) / path.name
+            save_asset(asset, output, parser.get_vertex_declarations()[0], template=path)
+            _, saved_blobs = blobs(output)
+            checks['save_asset'] = saved_blobs == [vertex_blob, index_blob, skeleton_blob]
+
+            save_asset(asset, output)
+            saved = load_asset(output)
+            checks['save_asset_default'] = (np.array_equal(lod_ranges(saved), lod_ranges(asset)) and np.array_equal(saved.indices, asset.indices)
+                and all(np.array_equal(getattr(saved.vertices, name), getattr(asset.vertices, name), equal_nan=True) for name in VertexBinConverter.COMPONENTS if getattr(asset.vertices, name) is not None)
+                and saved.skeleton.names == asset.skeleton.names)
+
+        vertices = converter.bin_to_vertices(vertex_blob)
+        per_vertex = min(timeit.repeat(lambda: [converter.vertex_to_bin(vertex) for vertex in vertices], number=1, repeat=REPEAT))
+        columnar = min(timeit.repeat(lambda: converter.columns_to_bin(columns), number=1, repeat=REPEAT))
+
+        failed = [name for name, passed in checks.items() if not passed]
+        failures += len(failed)
+        print(f"{path.name}: {columns.count} vertices, vertex_to_bin {per_vertex * 1000:.1f} ms, columns_to_bin {columnar * 1000:.3f} ms, "
+              f"x{per_vertex / columnar:.0f}, " + (f"MISMATCH {', '.join(failed)}" if failed else "byte-identical"))
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
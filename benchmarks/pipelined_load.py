@@ -0,0 +1,66 @@
+# Compares the pipelined AssetLoader with the sequential load it replaced (parse the .xdb, inflate the
+# whole .bin, then decode), on the samples and on a large synthetic asset, and checks that both decode
+# the same geometry. The saving is bounded by the shorter of parsing and inflating, and needs a second core.
+#
+# Usage: python benchmarks/pipelined_load.py [--vertices N] [--repeat N]
+
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from allods_geometry import XdbParser, BinParser, BoneBinParser, IndexBinConverter, VertexBinConverter, GeometryAsset, AssetLoader, Profiler, model_name
+
+import synthetic
+
+def sequential_load(path):
+    # Former load_asset, every stage after the other
+    parser = XdbParser(path)
+    bin_parser = BinParser(path.with_suffix('.bin'))
+    vertices = VertexBinConverter(parser.get_vertex_declarations()[0]).bin_to_columns(bin_parser.get_buffer(parser.get_vertex_buffer()))
+    indices = IndexBinConverter(parser.get_index_count(), parser.get_vb32()).bin_to_indices(bin_parser.get_buffer(parser.get_index_buffer()))
+    skeleton = BoneBinParser(bin_parser.get_buffer(parser.get_skeleton())).get_bone_columns()
+    return GeometryAsset(model_name(path), vertices, indices, parser.get_model_elements(), skeleton)
+
+def check(path):
+    expected, asset = sequential_load(path), AssetLoader(path).result()
+    for name in VertexBinConverter.COMPONENTS:
+        column = getattr(expected.vertices, name)
+        assert (column is None) == (getattr(asset.vertices, name) is None), name
+        assert column is None or np.array_equal(column, getattr(asset.vertices, name)), name
+    assert np.array_equal(expected.indices, asset.indices)
+    assert expected.skeleton.names == asset.skeleton.names
+    assert np.array_equal(expected.skeleton.local_matrices, asset.skeleton.local_matrices)
+    assert [element.name for element in expected.model_elements] == [element.name for element in asset.model_elements]
+
+def compare(path, repeat):
+    check(path)
+    sequential = min(timeit.repeat(lambda: sequential_load(path), number=1, repeat=repeat))
+    pipelined = min(timeit.repeat(lambda: AssetLoader(path).result(), number=1, repeat=repeat))
+    profiler = Profiler()
+    AssetLoader(path, profiler).result()
+    stages = ", ".join(f"{name} {profiler.totals[name] * 1000:.2f} ms" for name in ('xdb_parse', 'inflate', 'inflate_wait'))
+    print(f"{path.name}: sequential {sequential * 1000:.2f} ms, pipelined {pipelined * 1000:.2f} ms ({sequential / pipelined:.2f}x) - {stages}")
+
+def main(argv):
+    arguments = argparse.ArgumentParser(description='Compare sequential and pipelined loading of Allods geometry assets')
+    arguments.add_argument('--vertices', type=int, default=500000, help='vertices of the synthetic asset (default: 500000)')
+    arguments.add_argument('--repeat', type=int, default=10, help='timings per load, the best one is kept (default: 10)')
+    args = arguments.parse_args(argv)
+
+    print(f"{os.cpu_count()} cores")
+    for path in sorted((ROOT / 'samples').glob('**/*.xdb')):
+        compare(path, args.repeat)
+    with tempfile.TemporaryDirectory() as directory:
+        compare(synthetic.generate(directory, 'Synthetic', vertices=args.vertices, lods=3, elements=256, bones=64, declaration='full'), args.repeat)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,60 @@
+# Compares per-bone and vectorized skeleton decoding on the sample assets, and checks the
+# bind pose matrices against the inverted world matrices of skinned bones.
+#
+# Usage: python benchmarks/skeleton_decode.py
+
+import pathlib
+import sys
+import timeit
+
+from struct import unpack_from
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from allods_geometry import XdbParser, BinParser, BoneBinParser, load_asset
+
+REPEAT = 20
+
+def per_bone(buffer):
+    # Former BoneBinParser.get_bones loop
+    bones = []
+    bone_list_offset, count, bone_names_offset, _, bone_ids_offset, _, bone_local_offset, _ = unpack_from('IIIIIIII', buffer)
+    bone_names_offset += 8
+    bone_ids_offset += 16
+    bone_local_offset += 24
+    for i in range(count):
+        coefficients_w = unpack_from('ffffffffffff', buffer, bone_list_offset + i*52)
+        parent = unpack_from('I', buffer, bone_list_offset + i*52 + 48)[0]
+        offset, length = unpack_from('II', buffer, bone_names_offset + i*8)
+        name = bytes(buffer[bone_names_offset + offset + i*8:bone_names_offset + offset + i*8 + length]).decode('utf-8').rstrip('\x00')
+        id = unpack_from('H', buffer, bone_ids_offset + i*2)[0]
+        coefficients_l = unpack_from('ffffffffffff', buffer, bone_local_offset + i*48)
+        bones.append((coefficients_w, parent, id, name, coefficients_l))
+    return bones
+
+def main():
+    for path in sorted(ROOT.glob('samples/*/*.xdb')):
+        parser = XdbParser(path)
+        buffer = BinParser(path.with_suffix('.bin')).get_buffer(parser.get_skeleton())
+
+        columns = BoneBinParser(buffer).get_bone_columns()
+        for i, (coefficients_w, parent, id, name, coefficients_l) in enumerate(per_bone(buffer)):
+            assert np.array_equal(columns.inverted_world_matrices[i, :, :3].ravel(), np.array(coefficients_w, dtype=np.float32)), name
+            assert np.array_equal(columns.local_matrices[i, :, :3].ravel(), np.array(coefficients_l, dtype=np.float32)), name
+            assert (columns.parents[i], columns.ids[i], columns.names[i]) == (parent, id, name)
+
+        # Bind pose of skinned bones is the inverse of their inverted world matrix
+        bind_matrices = load_asset(path).get_bind_matrices().transpose(0, 2, 1)
+        skinned = ~np.all(np.isclose(columns.inverted_world_matrices, np.identity(4)), axis=(1, 2))
+        assert np.allclose(bind_matrices[skinned] @ columns.inverted_world_matrices[skinned], np.identity(4), atol=1e-4)
+
+        bone_loop = min(timeit.repeat(lambda: per_bone(buffer), number=1, repeat=REPEAT))
+        vectorized = min(timeit.repeat(lambda: BoneBinParser(buffer).get_bone_columns(), number=1, repeat=REPEAT))
+        print(f"{path.name}: {columns.count} bones ({np.count_nonzero(skinned)} skinned), per bone {bone_loop * 1000:.3f} ms, "
+              f"vectorized {vectorized * 1000:.3f} ms, x{bone_loop / vectorized:.1f}")
+
+if __name__ == '__main__':
+    main()
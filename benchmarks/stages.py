@@ -0,0 +1,146 @@
+# Times every import stage on a synthetic asset, writes the timings as JSON and fails when a
+# stage is slower than a stored baseline. Mesh creation is timed when bpy can be imported.
+#
+# Usage: python benchmarks/stages.py [--vertices N] [--lods N] [--elements N] [--bones N] [--declaration NAME]
+#                                    [--output FILE] [--baseline FILE] [--save-baseline FILE] [--tolerance RATIO]
+#        blender --background --python benchmarks/stages.py -- [same options]
+
+import argparse
+import json
+import pathlib
+import platform
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from allods_geometry import XdbParser, BinParser, BoneBinParser, IndexBinConverter, VertexBinConverter, load_asset, dequantize_normals, dequantize_colors, dequantize_texcoords
+
+import synthetic
+
+try:
+    import bpy
+    from allods_geometry.importer import build_mesh, add_uv_layer
+except ImportError:
+    bpy = None
+
+def fragments(asset):
+    return [(model_element, lod_level) for model_element in asset.model_elements for lod_level in range(len(model_element.lods))]
+
+def inflate(bin_path):
+    BinParser(bin_path).close()
+
+def decode_vertices(parser, buffer):
+    columns = VertexBinConverter(parser.get_vertex_declarations()[0]).bin_to_columns(buffer)
+    # The views are materialized the way meshes consume them
+    return [np.ascontiguousarray(getattr(columns, name), dtype=np.float32) for name in ('position', 'texcoord0')]
+
+def decode_attributes(asset):
+    # Bulk dequantization of the optional attributes the importer can add to meshes
+    vertices = asset.vertices
+    for column, dequantize in ((vertices.normal, dequantize_normals), (vertices.color, dequantize_colors), (vertices.texcoord1, dequantize_texcoords)):
+        if column is not None:
+            dequantize(column)
+
+def decode_triangles(parser, buffer, asset):
+    IndexBinConverter(parser.get_index_count(), parser.get_vb32()).bin_to_indices(buffer)
+    return [asset.get_triangles(model_element, lod_level) for model_element, lod_level in fragments(asset)]
+
+def decode_skeleton(buffer, asset):
+    BoneBinParser(buffer).get_bone_columns()
+    return asset.get_bind_matrices()
+
+def skin_weights(asset):
+    return [asset.get_skin_weights(model_element, lod_level) for model_element, lod_level in fragments(asset)]
+
+def build_meshes(asset):
+    for model_element, lod_level in fragments(asset):
+        lod_vertices = asset.get_vertex_range(model_element, model_element.lods[lod_level])
+        triangles = asset.get_triangles(model_element, lod_level)
+        mesh = build_mesh(model_element.name, asset.vertices.position[lod_vertices, :3], triangles)
+        add_uv_layer(mesh, triangles, asset.vertices.texcoord0[lod_vertices, :2])
+        bpy.data.meshes.remove(mesh)
+
+def time_stages(path, repeat):
+    """Best of repeat timings in seconds of each stage on the asset at path"""
+    parser = XdbParser(path)
+    bin_parser = BinParser(path.with_suffix('.bin'))
+    asset = load_asset(path)
+
+    stages = {
+        'inflate': lambda: inflate(path.with_suffix('.bin')),
+        'xdb_parse': lambda: XdbParser(path),
+        'vertex_decode': lambda: decode_vertices(parser, bin_parser.get_buffer(parser.get_vertex_buffer())),
+        'attribute_decode': lambda: decode_attributes(asset),
+        'index_decode': lambda: decode_triangles(parser, bin_parser.get_buffer(parser.get_index_buffer()), asset),
+        'load_asset': lambda: load_asset(path),
+    }
+    if asset.skeleton.count:
+        stages['skeleton_decode'] = lambda: decode_skeleton(bin_parser.get_buffer(parser.get_skeleton()), asset)
+    if asset.is_skinned():
+        stages['skin_weights'] = lambda: skin_weights(asset)
+    if bpy != None:
+        stages['mesh_build'] = lambda: build_meshes(asset)
+
+    return {name: min(timeit.repeat(stage, number=1, repeat=repeat)) for name, stage in stages.items()}
+
+def regressions(results, baseline, tolerance, min_delta):
+    # Stages slower than the baseline by more than the tolerance ratio, ignoring differences below min_delta seconds
+    failures = []
+    for name, seconds in results['stages'].items():
+        reference = baseline['stages'].get(name)
+        if reference != None and seconds > reference * (1 + tolerance) and seconds - reference > min_delta:
+            failures.append((name, reference, seconds))
+    return failures
+
+def main(argv):
+    arguments = argparse.ArgumentParser(description='Time the import stages on a synthetic Allods geometry asset')
+    synthetic.add_arguments(arguments)
+    arguments.set_defaults(vertices=100000, lods=3, elements=4, bones=64, declaration='full')
+    arguments.add_argument('--repeat', type=int, default=5, help='timings per stage, the best one is kept (default: 5)')
+    arguments.add_argument('--output', type=pathlib.Path, help='write the timings to this JSON file')
+    arguments.add_argument('--baseline', type=pathlib.Path, help='compare the timings with this JSON file, exit with 1 on regressions')
+    arguments.add_argument('--save-baseline', type=pathlib.Path, help='write the timings as a new baseline')
+    arguments.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown ratio over the baseline (default: 0.25)')
+    arguments.add_argument('--min-delta', type=float, default=0.0005, help='slowdowns below this many seconds are ignored (default: 0.0005)')
+    args = arguments.parse_args(argv)
+
+    config = {name: getattr(args, name) for name in ('vertices', 'lods', 'elements', 'bones', 'declaration', 'seed')}
+    with tempfile.TemporaryDirectory() as directory:
+        path = synthetic.generate(directory, **config)
+        config['xdb_size'] = path.stat().st_size
+        config['bin_size'] = path.with_suffix('.bin').stat().st_size
+        stages = time_stages(path, args.repeat)
+
+    results = {
+        'config': config,
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'blender': bpy.app.version_string if bpy != None else None},
+        'stages': stages,
+    }
+
+    for name, seconds in stages.items():
+        print(f"{name:>16}: {seconds * 1000:9.2f} ms")
+    for output in (args.output, args.save_baseline):
+        if output != None:
+            output.write_text(json.dumps(results, indent=2) + '\n')
+
+    if args.baseline != None:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline['config'] != config:
+            print(f"Baseline {args.baseline} was measured on a different asset: {baseline['config']}")
+            return 2
+        failures = regressions(results, baseline, args.tolerance, args.min_delta)
+        for name, reference, seconds in failures:
+            print(f"Regression in {name}: {reference * 1000:.2f} ms -> {seconds * 1000:.2f} ms (x{seconds / reference:.2f})")
+        if failures:
+            return 1
+        print(f"No stage slower than {args.baseline} by more than {args.tolerance:.0%}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]))
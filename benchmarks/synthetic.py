@@ -0,0 +1,175 @@
+# Writes synthetic .xdb/.bin geometry pairs at a configurable scale.
+#
+# Usage: python benchmarks/synthetic.py OUTPUT_DIRECTORY [--vertices N] [--lods N] [--elements N] [--bones N] [--declaration NAME]
+
+import argparse
+import pathlib
+import struct
+import sys
+import zlib
+
+from xml.etree import ElementTree
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from allods_geometry import VertexBinConverter, VertexComponent, VertexDeclaration, VertexElementType, VERTEX_ELEMENT_DTYPES
+
+# Component types of each vertex declaration preset, packed in this order, missing components are UNUSED
+DECLARATIONS = {
+    'static': {'position': 'FLOAT3', 'texcoord0': 'FLOAT2', 'normal': 'COLOR4'},
+    'skinned': {'position': 'FLOAT3', 'texcoord0': 'FLOAT2', 'normal': 'COLOR4', 'weights': 'COLOR4', 'indices': 'UBYTE4'},
+    'packed': {'position': 'HALF4', 'texcoord0': 'SHORT2', 'normal': 'SHORT4', 'color': 'COLOR4', 'texcoord1': 'HALF4'},
+    'full': {'position': 'FLOAT3', 'texcoord0': 'FLOAT2', 'normal': 'SHORT4', 'color': 'COLOR4', 'texcoord1': 'HALF4',
+             'weights': 'COLOR4', 'indices': 'UBYTE4'},
+}
+
+def vertex_declaration(name):
+    components = dict()
+    offset = 0
+    for component in VertexBinConverter.COMPONENTS:
+        if component in DECLARATIONS[name]:
+            element_type = VertexElementType[DECLARATIONS[name][component]]
+            components[component] = VertexComponent(element_type, offset)
+            scalar, count = VERTEX_ELEMENT_DTYPES[element_type]
+            offset += np.dtype(scalar).itemsize * count
+        else:
+            components[component] = VertexComponent(VertexElementType.UNUSED, 255)
+    return VertexDeclaration(*(components[component] for component in VertexBinConverter.COMPONENTS), offset)
+
+def random_component(random, element_type, component, count, bones):
+    scalar, size = VERTEX_ELEMENT_DTYPES[element_type]
+    if component == 'indices':
+        # Matrix register of up to four bones, 255 for unused influences
+        values = random.integers(0, max(min(bones, 85), 1), (count, size)) * 3
+        values[:, 2:] = 255
+        return values
+    if component == 'weights':
+        first = random.integers(0, 256, count)
+        return np.stack([first, 255 - first, np.zeros(count), np.zeros(count)], axis=1)
+    if np.dtype(scalar).kind == 'f':
+        return random.uniform(-10, 10, (count, size))
+    limits = np.iinfo(scalar)
+    return random.integers(limits.min, limits.max, (count, size), endpoint=True)
+
+def skeleton_blob(random, bones):
+    # Header of (offset, count) pairs, offsets relative to their own field, then bone list, names, local matrices and ids
+    names = [f"Bone{i:04}".encode('utf-8') + b'\x00' for i in range(bones)]
+    parents = np.array([0xFFFF] + [random.integers(0, i) for i in range(1, bones)], dtype=np.uint32)[:bones]
+    matrices = np.tile(np.eye(4, 3, dtype=np.float32), (bones, 1, 1))
+    matrices[:, 3] = random.uniform(-1, 1, (bones, 3))
+
+    bone_list = np.zeros(bones, dtype=[('matrix', '<f4', (4, 3)), ('parent', '<u4')])
+    bone_list['matrix'] = matrices
+    bone_list['parent'] = parents
+
+    bone_list_offset = 32
+    names_offset = bone_list_offset + bone_list.nbytes
+    name_entries = bytearray()
+    name_strings = bytearray()
+    for i, name in enumerate(names):
+        name_entries += struct.pack('II', 8 * bones - 8 * i + len(name_strings), len(name))
+        name_strings += name
+    local_offset = names_offset + len(name_entries) + len(name_strings)
+    ids_offset = local_offset + matrices.nbytes
+
+    header = struct.pack('IIIIIIII', bone_list_offset, bones, names_offset - 8, bones, ids_offset - 16, bones, local_offset - 24, bones)
+    ids = random.permutation(bones).astype('<u2')
+    return header + bone_list.tobytes() + bytes(name_entries) + bytes(name_strings) + matrices.astype('<f4').tobytes() + ids.tobytes()
+
+def generate(directory, name='Synthetic', vertices=10000, lods=1, elements=1, bones=0, declaration='static', seed=0):
+    """Write name.(Geometry).xdb and .bin in directory, returns the .xdb path"""
+    random = np.random.default_rng(seed)
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    xdb_path = directory / f"{name}.(Geometry).xdb"
+
+    declaration = vertex_declaration(declaration)
+    converter = VertexBinConverter(declaration)
+
+    # Vertices are split between elements, each LOD has half the triangles of the previous one
+    element_vertices = [vertices // elements + (1 if i < vertices % elements else 0) for i in range(elements)]
+    records = np.zeros(vertices, dtype=converter.dtype)
+    for component in converter.dtype.names:
+        element_type = getattr(declaration, component).type
+        records[component] = random_component(random, element_type, component, vertices, bones)
+
+    index_chunks = []
+    element_lods = []
+    index_count = 0
+    for count in element_vertices:
+        fragments = []
+        triangles = max(count, 1)
+        for _ in range(lods):
+            chunk = random.integers(0, max(count, 1), triangles * 3) if count else np.zeros(0, dtype=np.int64)
+            index_chunks.append(chunk)
+            fragments.append((0, count, index_count, index_count + len(chunk)))
+            index_count += len(chunk)
+            triangles = max(triangles // 2, 1)
+        element_lods.append(fragments)
+    index_dtype = '<u4' if max(element_vertices) > 0xFFFF else '<u2'
+    index_buffer = np.concatenate(index_chunks).astype(index_dtype).tobytes()
+
+    blobs = [records.tobytes(), index_buffer, skeleton_blob(random, bones) if bones else struct.pack('IIIIIIII', 32, 0, 0, 0, 0, 0, 0, 0)]
+    compressor = zlib.compressobj()
+    with open(xdb_path.with_suffix('.bin'), 'wb') as f:
+        for local_id, blob in enumerate(blobs):
+            f.write(compressor.compress(struct.pack('II', local_id, len(blob))))
+            f.write(compressor.compress(blob))
+        f.write(compressor.flush())
+
+    root = ElementTree.Element('Geometry')
+    item = ElementTree.SubElement(ElementTree.SubElement(root, 'vertexDeclarations'), 'Item')
+    for component in VertexBinConverter.COMPONENTS:
+        element = ElementTree.SubElement(item, component)
+        ElementTree.SubElement(element, 'type').text = getattr(declaration, component).type.name
+        ElementTree.SubElement(element, 'offset').text = str(getattr(declaration, component).offset)
+    ElementTree.SubElement(item, 'stride').text = str(declaration.stride)
+    ElementTree.SubElement(root, 'vb32').text = 'true' if index_dtype == '<u4' else 'false'
+    for tag, local_id in (('vertexBuffer', 0), ('indexBuffer', 1), ('skeleton', 2)):
+        element = ElementTree.SubElement(root, tag)
+        ElementTree.SubElement(element, 'size').text = str(len(blobs[local_id]))
+        ElementTree.SubElement(element, 'localID').text = str(local_id)
+    model_elements = ElementTree.SubElement(root, 'modelElements')
+    offset = 0
+    for i, (count, fragments) in enumerate(zip(element_vertices, element_lods)):
+        item = ElementTree.SubElement(model_elements, 'Item')
+        for tag, text in (('vertexDeclarationID', 0), ('vertexBufferOffset', offset), ('virtualOffset', 0), ('skinIndex', 0),
+                          ('name', f"Element{i}"), ('materialName', f"Material{i}")):
+            ElementTree.SubElement(item, tag).text = str(text)
+        material = ElementTree.SubElement(item, 'material')
+        for tag, text in (('visible', 'true'), ('vTranslateSpeed', '0'), ('useFog', 'true'), ('uTranslateSpeed', '0'), ('transparent', 'false'),
+                          ('scrollRGB', 'true'), ('scrollAlpha', 'true'), ('BlendEffect', 'BLEND_EFFECT_ADD')):
+            ElementTree.SubElement(material, tag).text = text
+        ElementTree.SubElement(material, 'diffuseTexture', href=f"/Synthetic/Texture{i}.(Texture).xdb#xpointer(/Texture)")
+        ElementTree.SubElement(material, 'transparencyTexture', href="")
+        lods_element = ElementTree.SubElement(item, 'lods')
+        for vertex_begin, vertex_end, index_begin, index_end in fragments:
+            lod = ElementTree.SubElement(lods_element, 'Item')
+            for tag, value in (('vertexBufferEnd', vertex_end), ('vertexBufferBegin', vertex_begin), ('indexBufferEnd', index_end), ('indexBufferBegin', index_begin)):
+                ElementTree.SubElement(lod, tag).text = str(value)
+        offset += count
+    ElementTree.SubElement(root, 'binaryFile', href=f"/Synthetic/{name}.(Geometry).bin")
+    ElementTree.ElementTree(root).write(xdb_path, encoding='utf-8', xml_declaration=True)
+
+    return xdb_path
+
+def add_arguments(arguments):
+    arguments.add_argument('--vertices', type=int, default=10000, help='total vertex count (default: 10000)')
+    arguments.add_argument('--lods', type=int, default=1, help='LOD fragments per model element (default: 1)')
+    arguments.add_argument('--elements', type=int, default=1, help='model elements (default: 1)')
+    arguments.add_argument('--bones', type=int, default=0, help='skeleton bones (default: 0)')
+    arguments.add_argument('--declaration', choices=sorted(DECLARATIONS), default='static', help='vertex declaration (default: static)')
+    arguments.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+
+def main():
+    arguments = argparse.ArgumentParser(description='Write a synthetic Allods geometry .xdb/.bin pair')
+    arguments.add_argument('output', type=pathlib.Path, help='directory receiving the files')
+    add_arguments(arguments)
+    args = arguments.parse_args()
+    print(generate(args.output, vertices=args.vertices, lods=args.lods, elements=args.elements, bones=args.bones, declaration=args.declaration, seed=args.seed))
+
+if __name__ == '__main__':
+    main()
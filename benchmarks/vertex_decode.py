@@ -0,0 +1,49 @@
+# Compares per-vertex and columnar vertex decoding on the sample assets. bin_to_columns only makes views over
+# the buffer, so the columnar timing includes the float32 copies meshes are built from, as in stages.py.
+#
+# Usage: python benchmarks/vertex_decode.py
+
+import pathlib
+import sys
+import timeit
+
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from allods_geometry import XdbParser, BinParser, VertexBinConverter
+
+REPEAT = 5
+
+def check_same(converter, vertices, columns):
+    assert columns.count == len(vertices)
+    for name in VertexBinConverter.COMPONENTS:
+        column = getattr(columns, name)
+        if column is None:
+            assert all(getattr(v, name) is None for v in vertices), name
+        else:
+            expected = np.array([getattr(v, name) for v in vertices], dtype=column.dtype)
+            assert np.array_equal(column, expected, equal_nan=column.dtype.kind == 'f'), name
+
+def decode_columns(converter, buffer):
+    columns = converter.bin_to_columns(buffer)
+    return [np.ascontiguousarray(getattr(columns, name), dtype=np.float32) for name in ('position', 'normal', 'texcoord0') if getattr(columns, name) is not None]
+
+def main():
+    for path in sorted(ROOT.glob('samples/*/*.xdb')):
+        parser = XdbParser(path)
+        bin_parser = BinParser(path.with_suffix('.bin'))
+        converter = VertexBinConverter(parser.get_vertex_declarations()[0])
+        buffer = bin_parser.get_buffer(parser.get_vertex_buffer())
+
+        check_same(converter, converter.bin_to_vertices(buffer), converter.bin_to_columns(buffer))
+
+        per_vertex = min(timeit.repeat(lambda: converter.bin_to_vertices(buffer), number=1, repeat=REPEAT))
+        columnar = min(timeit.repeat(lambda: decode_columns(converter, buffer), number=1, repeat=REPEAT))
+        count = len(buffer) // converter.vertex_declaration.stride
+        print(f"{path.name}: {count} vertices, bin_to_vertices {per_vertex * 1000:.2f} ms, "
+              f"bin_to_columns and copies {columnar * 1000:.3f} ms, x{per_vertex / columnar:.0f}")
+
+if __name__ == '__main__':
+    main()
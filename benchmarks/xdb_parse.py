@@ -0,0 +1,62 @@
+# Compares the single walk XdbParser with the per-value find() parser it replaced.
+#
+# Usage: python benchmarks/xdb_parse.py
+
+import pathlib
+import sys
+import timeit
+
+from xml.etree import ElementTree
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from allods_geometry import XdbParser, VertexBinConverter, BlendEffect
+
+REPEAT = 20
+
+def tree_material(xml):
+    # Former XdbParser._parse_material, with the ScrollRGB lookup and vTranslateSpeed conversion fixed
+    href = lambda key: xml.find(key).attrib['href'] if xml.find(key) is not None else None
+    flag = lambda key: xml.find(key).text == 'true'
+    scroll_rgb = xml.find('ScrollRGB') if xml.find('ScrollRGB') is not None else xml.find('scrollRGB')
+    return (BlendEffect[xml.find('BlendEffect').text], href('diffuseTexture'), flag('scrollAlpha'), scroll_rgb.text == 'true', href('transparencyTexture'),
+            flag('transparent'), flag('useFog'), float(xml.find('uTranslateSpeed').text), flag('visible'), float(xml.find('vTranslateSpeed').text))
+
+def tree_parse(path):
+    # Former parser, reduced to the values it extracted, plus materials
+    content = ElementTree.parse(path).getroot()
+    declarations = []
+    for item in content.findall('vertexDeclarations/Item'):
+        components = [(item.find(f"{name}/type").text, int(item.find(f"{name}/offset").text)) for name in VertexBinConverter.COMPONENTS]
+        declarations.append((components, int(item.find('stride').text)))
+    blobs = [(int(content.find(f"{blob}/localID").text), int(content.find(f"{blob}/size").text)) for blob in ('vertexBuffer', 'indexBuffer', 'skeleton')]
+    elements = []
+    for item in content.findall('modelElements/Item'):
+        lods = [(int(lod.find('vertexBufferBegin').text), int(lod.find('vertexBufferEnd').text), int(lod.find('indexBufferBegin').text), int(lod.find('indexBufferEnd').text))
+                for lod in item.findall('lods/Item')]
+        elements.append((lods, item.find('name').text, item.find('materialName').text, int(item.find('vertexDeclarationID').text),
+                         int(item.find('vertexBufferOffset').text), int(item.find('skinIndex').text), float(item.find('virtualOffset').text), tree_material(item.find('material'))))
+    return declarations, blobs, elements, content.find('binaryFile').attrib['href']
+
+def stream_parse(path):
+    parser = XdbParser(path)
+    declarations = [([(getattr(d, name).type.name, getattr(d, name).offset) for name in VertexBinConverter.COMPONENTS], d.stride) for d in parser.get_vertex_declarations()]
+    blobs = [(blob.localId, blob.size) for blob in (parser.get_vertex_buffer(), parser.get_index_buffer(), parser.get_skeleton())]
+    elements = [([(lod.vertex_buffer_begin, lod.vertex_buffer_end, lod.index_buffer_begin, lod.index_buffer_end) for lod in e.lods],
+                 e.name, e.material_name, e.vertex_declaration_id, e.vertex_buffer_offset, e.skin_index, e.virtual_offset,
+                 (e.material.blend_effect, e.material.diffuse_texture, e.material.scroll_alpha, e.material.scroll_rgb, e.material.transparency_texture,
+                  e.material.transparent, e.material.use_fog, e.material.u_translate_speed, e.material.visible, e.material.v_translate_speed)) for e in parser.get_model_elements()]
+    return declarations, blobs, elements, parser.get_binary_file()
+
+def main():
+    for path in sorted(ROOT.glob('samples/*/*.xdb')):
+        assert tree_parse(path) == stream_parse(path), path.name
+
+        tree = min(timeit.repeat(lambda: tree_parse(path), number=1, repeat=REPEAT))
+        stream = min(timeit.repeat(lambda: XdbParser(path), number=1, repeat=REPEAT))
+        print(f"{path.name}: {path.stat().st_size / 1e3:.0f} kB, ElementTree + find {tree * 1000:.2f} ms, "
+              f"single walk {stream * 1000:.2f} ms, x{tree / stream:.2f}")
+
+if __name__ == '__main__':
+    main()